@@ -0,0 +1,99 @@
+import os
+import csv
+import tempfile
+import numpy as np
+from vision_api.camera import Camera
+from vision_api.handeye_calibration import fit_model, check_model
+
+
+class AutoCalibration:
+    def __init__(self, robot, move, cam: Camera, calib, center=(275, -30), span=(80, 80), grid=(3, 3),
+                 z=-150, r=46, settle_timeout=3.0, timeout=10.0, max_rms=1.0, progress=None):
+        self.robot = robot
+        self.move = move
+        self.cam = cam
+        self.calib = calib
+
+        # grid of robot XY poses (mm) centred on center, marker held at height z
+        self.center = center
+        self.span = span
+        self.grid = grid
+        self.z = z
+        self.r = r
+        self.settle_timeout = settle_timeout
+        self.timeout = timeout
+        self.max_rms = max_rms
+
+        # progress(index, marker_x, marker_y, robot_x, robot_y) after every recorded pair
+        self.progress = progress
+
+    def grid_points(self):
+        xs = np.linspace(self.center[0] - self.span[0] / 2, self.center[0] + self.span[0] / 2, self.grid[0])
+        ys = np.linspace(self.center[1] - self.span[1] / 2, self.center[1] + self.span[1] / 2, self.grid[1])
+        gx, gy = np.meshgrid(xs, ys)
+        # serpentine rows so consecutive poses are neighbours
+        gx[1::2] = gx[1::2, ::-1]
+        return np.stack([gx.ravel(), gy.ravel()], axis=1)
+
+    def capture_pair(self, x, y):
+        self.move.MovL(x, y, self.z, self.r)
+        if not self.robot.wait_arrive([x, y, self.z, self.r], timeout=self.timeout):
+            raise TimeoutError(f"Robot did not reach [{x:.1f}, {y:.1f}] within {self.timeout} s")
+
+        # forget frames taken while moving so the centroid only averages the arrived pose
+        if self.cam.marker_id is not None:
+            self.cam.tracker.reset(("marker", self.cam.marker_id))
+        marker = self.cam.marker_position(timeout=self.settle_timeout)
+        if marker is None:
+            raise RuntimeError(f"Marker not found or not settled at robot [{x:.1f}, {y:.1f}]")
+        robot = self.robot.feed_data["tool_vector_actual"][0][:3].copy()
+
+        # marker depth pairs camera depth with robot Z for depth-driven probe heights
+        xyz = self.cam.deproject(self.cam.from_reference([marker]))
+        depth = xyz[0][2] if xyz is not None else np.nan
+        return marker, robot, depth
+
+    def run(self):
+        # drive the grid, record the pairs, write them to the calibration csv and fit
+        mode = self.cam.mode
+        self.cam.mode = Camera.MODE_ARUCO
+        camera_pts = []
+        robot_pts = []
+        depths = []
+        try:
+            for i, (x, y) in enumerate(self.grid_points()):
+                marker, robot, depth = self.capture_pair(x, y)
+                camera_pts.append(marker)
+                robot_pts.append(robot)
+                depths.append(depth)
+                if self.progress is not None:
+                    self.progress(i, *marker, *robot[:2])
+        finally:
+            self.cam.mode = mode
+
+        # fit and check in memory first, a rejected grid must not replace the calibration in use
+        calib = self.calib
+        model = fit_model(camera_pts, np.asarray(robot_pts)[:, :2], kind=calib.kind,
+                          camera_matrix=calib.camera_matrix, dist_coeffs=calib.dist_coeffs)
+        check_model(model, max_rms=self.max_rms)
+
+        self.write_csv(camera_pts, robot_pts, depths)
+        calib.invalidate()
+        return calib.validate(max_rms=self.max_rms)
+
+    def write_csv(self, camera_pts, robot_pts, depths):
+        # written aside and renamed over the csv, a crash mid-write leaves the old calibration intact
+        header = ["marker_X", "marker_Y", "robot_X", "robot_Y", "marker_depth", "robot_Z"]
+        fd, tmp = tempfile.mkstemp(suffix=".csv", dir=os.path.dirname(os.path.abspath(self.calib.file)))
+        try:
+            with os.fdopen(fd, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for (mx, my), (rx, ry, rz), depth in zip(camera_pts, robot_pts, depths):
+                    depth = "" if np.isnan(depth) else round(float(depth), 1)
+                    writer.writerow([round(mx, 1), round(my, 1), round(rx, 1), round(ry, 1), depth, round(rz, 1)])
+            os.replace(tmp, self.calib.file)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
@@ -0,0 +1,324 @@
+import csv
+import json
+import time
+import argparse
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Thread, Lock
+import numpy as np
+import cv2
+from vision_api.camera import Camera
+from vision_api.sensor import Sensor
+from vision_api.handeye_calibration import Calibration
+
+
+class LatencyHistogram:
+    def __init__(self, low=1e-6, high=100.0, ratio=1.05):
+        # log-spaced bins, each 5 % wide, from 1 us to 100 s, so one layout fits a contour pass and a move
+        n = int(np.ceil(np.log(high / low) / np.log(ratio))) + 1
+        self.edges = (low * ratio ** np.arange(n)).tolist()
+        self.counts = [0] * (n + 1)  # plus underflow / overflow bins at the ends
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        # upper edge of the bin holding the q-th percentile, clipped to the observed range
+        if self.count == 0:
+            return float("nan")
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                upper = self.edges[i] if i < len(self.edges) else self.max
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else float("nan")
+
+
+class StageTimer:
+    def __init__(self):
+        # stage name -> LatencyHistogram, safe to record from the capture, worker and feed threads
+        self.stages = {}
+        self._lock = Lock()
+        self._wrapped = []
+        self.started = time.perf_counter()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.started = time.perf_counter()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def wrap(self, obj, name, stage=None):
+        # times every call of obj.name from now on, the class and other instances are untouched
+        stage = stage or name
+        own = name in vars(obj)
+        original = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - t0)
+
+        setattr(obj, name, timed)
+        self._wrapped.append((obj, name, original if own else None))
+        return original
+
+    def unwrap(self):
+        for obj, name, original in reversed(self._wrapped):
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self._wrapped = []
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rows = []
+        with self._lock:
+            for stage, h in self.stages.items():
+                rows.append({
+                    "stage": stage,
+                    "count": h.count,
+                    "mean_ms": round(h.mean * 1e3, 4),
+                    "p50_ms": round(h.percentile(50) * 1e3, 4),
+                    "p95_ms": round(h.percentile(95) * 1e3, 4),
+                    "p99_ms": round(h.percentile(99) * 1e3, 4),
+                    "max_ms": round(h.max * 1e3, 4),
+                    "throughput_hz": round(h.count / elapsed, 2) if elapsed > 0 else 0.0,
+                })
+        return rows
+
+    def to_csv(self, path):
+        rows = self.summary()
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=["stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms",
+                                                   "max_ms", "throughput_hz"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def to_json(self, path, **meta):
+        with open(path, 'w') as f:
+            json.dump({**meta, "stages": self.summary()}, f, indent=2)
+
+
+# ============================ Instrumentation ============================
+def instrument_camera(cam: Camera, timer: StageTimer):
+    # wrap before start_capture so the capture thread picks up the timed _grab
+    timer.wrap(cam, "_grab", "frame_grab")
+    timer.wrap(cam, "detect", "detect")
+    timer.wrap(cam, "_find_markers", "aruco_detect")
+    timer.wrap(cam, "_panel_detection", "panel_detect")
+
+
+def instrument_calibration(calib: Calibration, timer: StageTimer):
+    timer.wrap(calib, "transfer_camera2robot", "calib_transform")
+    timer.wrap(calib, "transfer_points", "calib_transform_batch")
+
+
+def instrument_robot(robot, move, timer: StageTimer):
+    # DobotApiMove.MovL blocks for the controller reply, so this is the command round trip
+    timer.wrap(move, "MovL", "movl_rtt")
+    timer.wrap(robot, "wait_arrive", "arrival_wait")
+
+
+def instrument_sensor(sensor: Sensor, timer: StageTimer):
+    timer.wrap(sensor, "estimate", "sensor_estimate")
+    timer.wrap(sensor, "wait_samples", "sensor_wait")
+
+
+def record_feed_intervals(robot, timer: StageTimer):
+    # packet inter-arrival times from the pose history the feed thread already keeps
+    n = min(robot.pose_count, robot.pose_size)
+    idx = np.arange(robot.pose_count - n, robot.pose_count) % robot.pose_size
+    for dt in np.diff(robot.pose_stamps[idx]):
+        timer.record("feed_interval", float(dt))
+
+
+# ============================ Synthetic inputs ============================
+def synthetic_frames(n=200, shape=(480, 640), marker_id=0, seed=0):
+    # a bright panel and an ArUco marker on a noisy dark bench, jittered a few pixels per frame
+    # so ROI tracking and association see realistic motion. Seeded, so runs are comparable
+    rng = np.random.default_rng(seed)
+    h, w = shape
+    marker = cv2.aruco.drawMarker(cv2.aruco.Dictionary_get(cv2.aruco.DICT_ARUCO_ORIGINAL), marker_id, 80)
+    frames = np.empty((n, h, w, 3), dtype=np.uint8)
+    for i in range(n):
+        frame = rng.integers(20, 50, size=(h, w, 3), dtype=np.uint8)
+        dx, dy = rng.normal(0, 2, size=2)
+        center = (w * 0.4 + dx, h * 0.5 + dy)
+        box = cv2.boxPoints((center, (w * 0.3, h * 0.35), 8.0 + rng.normal(0, 0.5)))
+        cv2.fillConvexPoly(frame, box.astype(np.int32), (200, 200, 200))
+        mx, my = int(w * 0.72 + dx), int(h * 0.3 + dy)
+        frame[my - 10:my + 90, mx - 10:mx + 90] = 255
+        frame[my:my + 80, mx:mx + 80] = marker[:, :, None]
+        frames[i] = frame
+    return frames
+
+
+class SyntheticSensor(Sensor):
+    def __init__(self, rate=1000.0, batch=10, seed=0):
+        # a Serial with no port is never opened, lines are generated at rate per second
+        super().__init__(None)
+        self.sample_rate = rate
+        self.batch = batch
+        self._rng = np.random.default_rng(seed)
+        self._due = time.monotonic()
+
+    def _read_chunk(self):
+        self._due += self.batch / self.sample_rate
+        delay = self._due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        values = 2.5 + self._rng.normal(0, 0.01, size=self.batch)
+        return "".join(f"{v:.4f}\n" for v in values).encode("utf-8")
+
+
+# ============================ Benchmarks ============================
+def bench_detection(cam: Camera, frames, timer: StageTimer, mode=Camera.MODE_BOTH):
+    # synchronous detect over a fixed frame set, no capture thread, the comparable number across commits
+    cam.mode = mode
+    cam.height, cam.width = frames.shape[1:3]
+    for i, frame in enumerate(frames):
+        cam.detect(frame, i, time.monotonic())
+
+
+def bench_stream(cam: Camera, timer: StageTimer, frames=300, timeout=2.0):
+    # the live path: capture thread -> ring -> detect, including the wait for each new frame
+    ring = cam.ring
+    reader = ring.reader()
+    buffer = np.empty(ring.shape, dtype=ring.dtype)
+    for _ in range(frames):
+        with timer.time("frame_wait"):
+            got = ring.new_frame.wait(timeout)
+        if not got:
+            break
+        ring.new_frame.clear()
+        latest = reader.latest(out=buffer)
+        if latest is not None:
+            cam.detect(*latest)
+    return reader.dropped
+
+
+def bench_calibration(calib: Calibration, timer: StageTimer, n=2000, seed=0):
+    pts = np.random.default_rng(seed).uniform((0, 0), (640, 480), size=(n, 2))
+    for x, y in pts:
+        calib.transfer_camera2robot(x, y)
+    for i in range(0, n, 9):
+        calib.transfer_points(pts[i:i + 9])
+
+
+def bench_motion(robot, move, timer: StageTimer, points, r=46):
+    for x, y, z in points:
+        move.MovL(x, y, z, r)
+        robot.wait_arrive([x, y, z, r], timeout=10.0)
+    record_feed_intervals(robot, timer)
+
+
+def bench_sensor(sensor: Sensor, timer: StageTimer, n=100, rounds=50):
+    sensor.start_reader()
+    for _ in range(rounds):
+        sensor.estimate(n, since=time.monotonic())
+    sensor.stop_reader()
+
+
+def synthetic_calibration(path):
+    # known affine from the 3x3 calibration grid, written in the auto-calibration csv layout
+    camera_pts = np.array([[x, y] for y in (120, 240, 360) for x in (160, 320, 480)], dtype=np.float64)
+    robot_pts = camera_pts @ np.array([[0.0, -0.5], [-0.5, 0.0]]) + np.array([400.0, 130.0])
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["marker_X", "marker_Y", "robot_X", "robot_Y"])
+        for (mx, my), (rx, ry) in zip(camera_pts, robot_pts):
+            writer.writerow([mx, my, rx, ry])
+    return Calibration(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark on recorded or synthetic inputs")
+    parser.add_argument("--log", help="replay directory recorded with replay.Recorder, synthetic frames without it")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--calibration", help="calibration csv, a synthetic one without it")
+    parser.add_argument("--motion", action="store_true", help="also benchmark motion against the MG400 simulator")
+    parser.add_argument("--label", default="", help="stored in the json, e.g. the commit under test")
+    parser.add_argument("--out", default="benchmark", help="writes <out>.csv and <out>.json")
+    args = parser.parse_args(argv)
+
+    timer = StageTimer()
+
+    if args.log:
+        from replay import ReplayLog, ReplayClock, ReplayCamera
+        log = ReplayLog(args.log)
+        cam = ReplayCamera(log, ReplayClock(log, speed=0))
+        instrument_camera(cam, timer)
+        bench_detection(cam, np.asarray(log.frames[:args.frames]), timer)
+        cam.enable_camera()
+        bench_stream(cam, timer, frames=args.frames)
+        cam.disable_camera()
+    else:
+        cam = Camera()
+        instrument_camera(cam, timer)
+        bench_detection(cam, synthetic_frames(args.frames), timer)
+
+    calib = Calibration(args.calibration) if args.calibration else synthetic_calibration(args.out + "_calibration.csv")
+    instrument_calibration(calib, timer)
+    bench_calibration(calib, timer)
+
+    sensor = SyntheticSensor()
+    instrument_sensor(sensor, timer)
+    bench_sensor(sensor, timer)
+
+    if args.motion:
+        from simulator import MG400Simulator
+        from robot_api.robot import RobotExec
+        sim = MG400Simulator().start_in_thread()
+        robot = RobotExec()
+        robot.ip = sim.host
+        dashboard, move, feed = robot.connect_robot()
+        Thread(target=robot.get_feed, args=(feed,), daemon=True).start()
+        dashboard.EnableRobot()
+        instrument_robot(robot, move, timer)
+        grid = [(x, y, z) for x in (250, 300) for y in (-60, 0) for z in (-150, -160)]
+        bench_motion(robot, move, timer, grid)
+        dashboard.DisableRobot()
+        sim.stop_thread()
+
+    timer.unwrap()
+    timer.to_csv(args.out + ".csv")
+    timer.to_json(args.out + ".json", label=args.label, frames=args.frames, log=args.log)
+    for row in timer.summary():
+        print(f"{row['stage']:<22} n={row['count']:<6} p50={row['p50_ms']:.3f} ms  p95={row['p95_ms']:.3f} ms  "
+              f"p99={row['p99_ms']:.3f} ms  {row['throughput_hz']:.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,152 +1,448 @@
+import time
+import warnings
 import pyrealsense2 as rs
 import numpy as np
 import cv2
+from vision_api.capture import FrameRing, CaptureThread
+from vision_api.panel import find_panels
+from vision_api.tracker import Tracker
 
 
-class Camera:
-    def __init__(self):
+class DetectionResult:
+    def __init__(self, seq, stamp):
+        # capture sequence number and monotonic timestamp of the frame the result came from
+        self.seq = seq
+        self.stamp = stamp
+
+        # marker id -> (cX, cY) and marker id -> (4, 2) corners
+        self.markers = {}
+        self.marker_corners = {}
+        # best PanelModel and every candidate found, None / [] if there is no panel
+        self.panel = None
+        self.panels = []
+
+
+def _camera_matrix(intr):
+    return np.array([[intr.fx, 0, intr.ppx], [0, intr.fy, intr.ppy], [0, 0, 1]])
+
 
-        # Configure color streams
+def normalize_pixels(pts, intr):
+    # (N, 2) pixels -> (N, 2) undistorted normalized image coordinates of the rs intrinsics
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    if len(pts) and np.any(np.asarray(intr.coeffs)):
+        return cv2.undistortPoints(pts.reshape(-1, 1, 2), _camera_matrix(intr),
+                                   np.asarray(intr.coeffs)).reshape(-1, 2)
+    return np.stack([(pts[:, 0] - intr.ppx) / intr.fx, (pts[:, 1] - intr.ppy) / intr.fy], axis=1)
+
+
+def project_normalized(normalized, intr):
+    # inverse of normalize_pixels
+    normalized = np.asarray(normalized, dtype=np.float64).reshape(-1, 2)
+    if len(normalized) and np.any(np.asarray(intr.coeffs)):
+        rays = np.column_stack([normalized, np.ones(len(normalized))])
+        pixels, _ = cv2.projectPoints(rays, np.zeros(3), np.zeros(3), _camera_matrix(intr), np.asarray(intr.coeffs))
+        return pixels.reshape(-1, 2)
+    return np.stack([normalized[:, 0] * intr.fx + intr.ppx, normalized[:, 1] * intr.fy + intr.ppy], axis=1)
+
+
+class Camera:
+    # detection modes, each one runs only the detectors it needs
+    MODE_PANEL = "panel"
+    MODE_ARUCO = "aruco"
+    MODE_BOTH = "both"
+
+    # named stream profiles (width, height, fps), negotiated against what the device supports.
+    # Positions from every one are mapped onto reference_size through the stream intrinsics
+    PROFILES = {
+        "default": (640, 480, 30),
+        "tracking": (424, 240, 60),
+        "fast": (848, 480, 90),
+        "calibration": (1280, 800, 30),
+    }
+
+    def __init__(self, serial=None):
+
+        # Configure color streams, serial picks one RealSense when several are attached
+        self.serial = serial
         self.pipeline = rs.pipeline()
         self.config = rs.config()
+        if serial is not None:
+            self.config.enable_device(serial)
 
         # aruco tag configuration
         self.aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_ARUCO_ORIGINAL)
         self.arucoParams = cv2.aruco.DetectorParameters_create()
 
-        self.color_image = None
-        self.calibration_status = False
+        self.mode = Camera.MODE_PANEL
+
+        # aruco roi tracking: search around the last marker position, full frame on a miss
+        self.roi_margin = 40
+        self.roi_full_every = 15
+        self._marker_roi = None
+        self._roi_frames = 0
+        self.roi_hits = 0
+        self.full_searches = 0
+
+        # background capture into a ring of preallocated frames
+        self.width = 640
+        self.height = 480
+        self.fps = 30
+        # detection crop (x, y, w, h) in full-frame pixels, None for the whole frame
+        self.roi = None
+        # resolution the hand-eye calibration pixels refer to. Positions handed out for the robot are
+        # mapped to it through the intrinsics of both modes, so any profile can be used for them;
+        # reference_intrinsics come from the device's profile list and are None without a device
+        self.reference_size = (640, 480)
+        self.reference_intrinsics = None
+        self.aspect_tolerance = 0.02
+        self.ring = None
+        self.capture = None
+        self._reader = None
+        self._work = None
+
+        # depth aligned to the colour stream, depth_ring seq n belongs to colour seq n
+        self.depth_enabled = True
+        self.align = rs.align(rs.stream.color)
+        self.depth_ring = None
+        self.depth_scale = 0.001  # metres per depth unit
+        self.intrinsics = None  # colour stream intrinsics, shared by aligned depth
 
         # aruco tage center point
         self.cX = 0
         self.cY = 0
 
-        # panel center point
-        self.pX = 0
-        self.pY = 0
+        # most recent panel model, its probe_points() are the nine measuring positions
+        self.panel = None
+        self.min_panel_area = 800
+        # outlines are kept from min_panel_score (0..1, see PanelModel.score) against the expected
+        # long / short side ratio, None scores on rectangularity alone
+        self.min_panel_score = 0.6
+        self.panel_aspect = None
+
+        # smooths marker and panel positions across frames, keyed by ("marker", id) and ("panel", n)
+        self.tracker = Tracker()
+        self.marker_id = None
+        # panels seen in the last frame as key -> centre, and the key of the best one
+        self.panel_match_radius = 30
+        self.panel_keys = {}
+        self.panel_key = None
+        self._next_panel = 0
 
     def enable_camera(self):
         pipeline_wrapper = rs.pipeline_wrapper(self.pipeline)
         pipeline_profile = self.config.resolve(pipeline_wrapper)
         device = pipeline_profile.get_device()
         print(str(device.get_info(rs.camera_info.product_line)))
+        self.width, self.height, self.fps = self.negotiate(self.width, self.height, self.fps)
 
-        self.config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
+        self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+        if self.depth_enabled:
+            self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
 
         # Start streaming
-        self.pipeline.start(self.config)
-
-    def detection(self):
-        # Wait for a coherent pair of color frame
+        profile = self.pipeline.start(self.config)
+        self.intrinsics = profile.get_stream(rs.stream.color).as_video_stream_profile().get_intrinsics()
+        if (self.width, self.height) == tuple(self.reference_size):
+            self.reference_intrinsics = self.intrinsics
+        if self.depth_enabled:
+            self.depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+        self.start_capture()
+
+    def disable_camera(self):
+        self.stop_capture()
+        self.config.disable_all_streams()
+        self.pipeline.stop()
+        # belongs to the stopped mode, the next one may differ
+        self.intrinsics = None
+
+    def list_profiles(self):
+        # sorted (width, height, fps) modes the first device streams in bgr8, and in z16 too when depth is on
+        devices = rs.context().query_devices()
+        if self.serial is None:
+            device = devices[0]
+        else:
+            device = next((d for d in devices if d.get_info(rs.camera_info.serial_number) == self.serial), None)
+            if device is None:
+                raise RuntimeError(f"RealSense {self.serial} not found")
+        color = set()
+        depth = set()
+        for sensor in device.query_sensors():
+            for profile in sensor.get_stream_profiles():
+                if not profile.is_video_stream_profile():
+                    continue
+                video = profile.as_video_stream_profile()
+                mode = (video.width(), video.height(), video.fps())
+                if profile.stream_type() == rs.stream.color and profile.format() == rs.format.bgr8:
+                    color.add(mode)
+                    if mode[:2] == tuple(self.reference_size) and self.reference_intrinsics is None:
+                        self.reference_intrinsics = video.get_intrinsics()
+                elif profile.stream_type() == rs.stream.depth and profile.format() == rs.format.z16:
+                    depth.add(mode)
+        return sorted(color & depth if self.depth_enabled else color)
+
+    def negotiate(self, width, height, fps):
+        # closest supported mode: nearest resolution first, then nearest frame rate
+        modes = self.list_profiles()
+        if not modes:
+            raise RuntimeError("No supported stream profiles found")
+        return min(modes, key=lambda m: (abs(m[0] * m[1] - width * height), abs(m[0] - width), abs(m[2] - fps)))
+
+    def set_roi(self, roi):
+        # roi --> (x, y, w, h) clipped to the frame, None to detect on the whole frame
+        if roi is not None:
+            x, y, w, h = (int(v) for v in roi)
+            x = min(max(x, 0), self.width - 1)
+            y = min(max(y, 0), self.height - 1)
+            roi = (x, y, min(w, self.width - x), min(h, self.height - y))
+        self.roi = roi
+        # the marker search window is relative to the old crop
+        self._marker_roi = None
+
+    def set_profile(self, profile):
+        # profile --> name in PROFILES or (width, height, fps); restarts the stream if it is running
+        # returns the negotiated mode, consumers must take the new ring afterwards
+        width, height, fps = Camera.PROFILES[profile] if isinstance(profile, str) else profile
+        mode = self.negotiate(width, height, fps)
+        running = self.capture is not None
+        if running:
+            self.disable_camera()
+        self.width, self.height, self.fps = mode
+        self.roi = None
+        self._marker_roi = None
+        # tracked positions are in the old resolution's pixels
+        self.tracker.reset()
+        self.panel_keys = {}
+        self.panel_key = None
+        if running:
+            self.enable_camera()
+        return mode
+
+    def start_capture(self):
+        self.ring = FrameRing((self.height, self.width, 3), size=4)
+        self._reader = self.ring.reader()
+        self._work = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.depth_ring = FrameRing((self.height, self.width), dtype=np.uint16, size=4) if self.depth_enabled else None
+        self.capture = CaptureThread(self.ring, self._grab)
+        self.capture.start()
+
+    def stop_capture(self):
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
+
+    def _grab(self, out):
+        # runs on the capture thread, copies the sdk frame out before the sdk recycles it
         frames = self.pipeline.wait_for_frames()
+        if self.depth_ring is not None:
+            # librealsense runs the alignment on the GPU when built with CUDA, SSE otherwise
+            frames = self.align.process(frames)
+            depth_frame = frames.get_depth_frame()
+            if not depth_frame:
+                return False
         color_frame = frames.get_color_frame()
+        if not color_frame:
+            return False
+        np.copyto(out, np.asanyarray(color_frame.get_data()))
+        if self.depth_ring is not None:
+            # published just before the colour frame so both rings share sequence numbers
+            np.copyto(self.depth_ring.write_slot(), np.asanyarray(depth_frame.get_data()))
+            self.depth_ring.publish(time.monotonic())
+        return True
+
+    def depth_image(self, seq=None):
+        # copy of the aligned depth frame for colour frame seq (newest if None), in mm
+        ring = self.depth_ring
+        if ring is None or ring.seq < 0:
+            return None
+        seq = ring.seq if seq is None else seq
+        slot = seq % ring.size
+        depth = ring.buffers[slot] * (self.depth_scale * 1000.0)
+        if ring.slot_seq[slot] != seq:
+            return None
+        return depth
+
+    def deproject(self, points, depth=None, patch=2):
+        # (N, 2) pixels -> (N, 3) camera-frame points in mm, NaN where there is no depth.
+        # depth per point is the median of the valid pixels in a (2 * patch + 1)^2 window
+        if depth is None:
+            depth = self.depth_image()
+        if depth is None or self.intrinsics is None:
+            return None
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(pts) == 0:
+            return np.zeros((0, 3))
+        h, w = depth.shape
+        offsets = np.arange(-patch, patch + 1)
+        u = np.clip(np.rint(pts[:, 0])[:, None, None].astype(int) + offsets[None, None, :], 0, w - 1)
+        v = np.clip(np.rint(pts[:, 1])[:, None, None].astype(int) + offsets[None, :, None], 0, h - 1)
+        window = depth[v, u].reshape(len(pts), -1)
+        window = np.where(window > 0, window, np.nan)
+        with warnings.catch_warnings():
+            # all-NaN windows (no depth) come back as NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            z = np.nanmedian(window, axis=1)
+
+        normalized = normalize_pixels(pts, self.intrinsics)
+        return np.column_stack([normalized * z[:, None], z])
 
-        # Convert images to numpy arrays
-        color_image = np.asanyarray(color_frame.get_data())
-
-        # aruco tag detection
-        corners, ids, rejected = cv2.aruco.detectMarkers(color_image, self.aruco_dict, parameters=self.arucoParams)
-
-        if not self.calibration_status:
-            self._panel_detection(color_image)
+    def detection(self):
+        # take the newest captured frame without waiting on the device
+        latest = self._reader.latest(out=self._work)
+        if latest is None:
+            return None
+        return self.detect(*latest)
+
+    def detect(self, color_image, seq=0, stamp=0.0):
+        # safe to call from a worker thread, color_image is only read and never annotated
+        result = DetectionResult(seq, stamp)
+        mode = self.mode
+
+        # detectors only see the roi crop (a view, no copy), results are shifted back to full-frame pixels
+        roi = self.roi
+        if roi is not None:
+            x, y, w, h = roi
+            color_image = color_image[y:y + h, x:x + w]
+            offset = np.array([x, y], dtype=np.float64)
         else:
-            self._aruco_detection(corners, ids, color_image)
-
-    def _aruco_detection(self, corners, ids, color_image):
+            offset = np.zeros(2)
+
+        if mode in (Camera.MODE_ARUCO, Camera.MODE_BOTH):
+            corners, ids = self._find_markers(color_image)
+            self._aruco_detection(corners, ids, offset, result)
+        if mode in (Camera.MODE_PANEL, Camera.MODE_BOTH):
+            self._panel_detection(color_image, offset, result)
+        return result
+
+    def _find_markers(self, color_image):
+        roi = self._marker_roi
+        self._roi_frames += 1
+        # a periodic full-frame pass picks up markers that entered outside the window
+        if roi is not None and self._roi_frames < self.roi_full_every:
+            x0, y0, x1, y1 = roi
+            corners, ids, _ = cv2.aruco.detectMarkers(color_image[y0:y1, x0:x1], self.aruco_dict,
+                                                      parameters=self.arucoParams)
+            if len(corners) > 0:
+                offset = np.array([x0, y0], dtype=np.float32)
+                corners = tuple(c + offset for c in corners)
+                self._marker_roi = self._roi_around(corners, color_image.shape)
+                self.roi_hits += 1
+                return corners, ids
+
+        corners, ids, _ = cv2.aruco.detectMarkers(color_image, self.aruco_dict, parameters=self.arucoParams)
+        self.full_searches += 1
+        self._roi_frames = 0
+        self._marker_roi = self._roi_around(corners, color_image.shape) if len(corners) > 0 else None
+        return corners, ids
+
+    def _roi_around(self, corners, shape):
+        # bounding box of all markers grown by the marker size or roi_margin, clipped to the frame
+        pts = np.concatenate([c.reshape(-1, 2) for c in corners])
+        x0, y0 = pts.min(axis=0)
+        x1, y1 = pts.max(axis=0)
+        margin = max(self.roi_margin, x1 - x0, y1 - y0)
+        h, w = shape[:2]
+        return (max(int(x0 - margin), 0), max(int(y0 - margin), 0),
+                min(int(x1 + margin) + 1, w), min(int(y1 + margin) + 1, h))
+
+    def _aruco_detection(self, corners, ids, offset, result):
         if len(corners) > 0:
             ids = ids.flatten()
             for markerCorner, markerID in zip(corners, ids):
-                corners = markerCorner.reshape((4, 2))
+                corners = markerCorner.reshape((4, 2)) + offset
                 topLeft, topRight, bottomRight, bottomLeft = corners
-                topRight = (int(topRight[0]), int(topRight[1]))
-                bottomRight = (int(bottomRight[0]), int(bottomRight[1]))
-                bottomLeft = (int(bottomLeft[0]), int(bottomLeft[1]))
-                topLeft = (int(topLeft[0]), int(topLeft[1]))
-                cv2.line(color_image, topLeft, topRight, (0, 255, 0), 2)
-                cv2.line(color_image, topRight, bottomRight, (0, 255, 0), 2)
-                cv2.line(color_image, bottomRight, bottomLeft, (0, 255, 0), 2)
-                cv2.line(color_image, bottomLeft, topLeft, (0, 255, 0), 2)
-
-                # calculate and draw the center of tags
+
+                # calculate the center of tags
                 self.cX = int((topLeft[0] + bottomRight[0]) / 2.0)
                 self.cY = int((topLeft[1] + bottomRight[1]) / 2.0)
-                cv2.circle(color_image, (self.cX, self.cY), 2, (0, 0, 255), -1)
-                cv2.putText(color_image, f"[{self.cX}, {self.cY}]", (self.cX + 40, self.cY),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 1)
-
-        self.color_image = color_image
-
-    def _panel_detection(self, color_image):
-        gray = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (5, 5), 0)
-        binary = cv2.Canny(gray, 30, 120)
-        # turn grey image into binary image(edge)
-        # tuning parameter cv2.Canny(image,low_threshold',high_threshold)
-        # The high_threshold shall be set as 3 times the low_threshold following Canny's recommendation .
-        contours, hierarchy = cv2.findContours(binary,
-                                               cv2.RETR_EXTERNAL,
-                                               cv2.CHAIN_APPROX_SIMPLE)
-        for i in range(len(contours)):
-            # filter small area
-            area = cv2.contourArea(contours[i])
-            if area < 800:
-                continue
-            rect = cv2.minAreaRect(contours[i])
-            # calculate corners coordinate
-            box = cv2.boxPoints(rect)
-            box = np.int0(box)
-            # x, y = rect[0]
-
-            #get four vertices' coordinate
-
-            left_point_x = np.min(box[:, 0])
-            right_point_x = np.max(box[:, 0])
-            top_point_y = np.min(box[:, 0])
-            bottom_point_y = np.max(box[:, 0])
-
-            left_point_y = box[:, 1][np.where(box[:, 0] == left_point_x)][0]
-            right_point_y = box[:, 1][np.where(box[:, 0] == right_point_x)][0]
-
-
-
-
-            left_point_x = np.min(box[:, 0])
-
-
-            panelHei, panelWid = rect[1]
-            self.pX0 = int((box[0][0] + box[2][0]) / 2.0)
-            self.pY0 = int((box[0][1] + box[2][1]) / 2.0)
-            self.pX1 = int((box[0][0] + box[2][0]) / 2.0 + panelWid / 7.0 * 2.0)
-            self.pY1 = int((box[0][1] + box[2][1]) / 2.0)
-            self.pX2 = int((box[0][0] + box[2][0]) / 2.0 + panelWid / 7.0 * 2.0)
-            self.pY2 = int((box[0][1] + box[2][1]) / 2.0 + panelHei / 7.0 * 2.0)
-            self.pX3 = int((box[0][0] + box[2][0]) / 2.0)
-            self.pY3 = int((box[0][1] + box[2][1]) / 2.0 + panelHei / 7.0 * 2.0)
-            self.pX4 = int((box[0][0] + box[2][0]) / 2.0 - panelWid / 7.0 * 2.0)
-            self.pY4 = int((box[0][1] + box[2][1]) / 2.0 + panelHei / 7.0 * 2.0)
-            self.pX5 = int((box[0][0] + box[2][0]) / 2.0 - panelWid / 7.0 * 2.0)
-            self.pY5 = int((box[0][1] + box[2][1]) / 2.0)
-            self.pX6 = int((box[0][0] + box[2][0]) / 2.0 - panelWid / 7.0 * 2.0)
-            self.pY6 = int((box[0][1] + box[2][1]) / 2.0 - panelHei / 7.0 * 2.0)
-            self.pX7 = int((box[0][0] + box[2][0]) / 2.0)
-            self.pY7 = int((box[0][1] + box[2][1]) / 2.0 - panelHei / 7.0 * 2.0)
-            self.pX8 = int((box[0][0] + box[2][0]) / 2.0 + panelWid / 7.0 * 2.0)
-            self.pY8 = int((box[0][1] + box[2][1]) / 2.0 - panelHei / 7.0 * 2.0)
-
-
-            # define the center and other 8 points of the panel.
-            self.px = [self.pX0, self.pX1, self.pX2, self.pX3, self.pX4, self.pX5, self.pX6, self.pX7, self.pX8]
-            self.py = [self.pY0, self.pY1, self.pY2, self.pY3, self.pY4, self.pY5, self.pY6, self.pY7, self.pY8]
-
-            cv2.circle(color_image, (self.pX, self.pY), 2, (0, 0, 255), -1)
-
-            #putText Panel
-            cv2.putText(color_image, f"[{self.pX}, {self.pY}]", (self.pX + 40, self.pY),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 1)
-
-
-
-
-            cv2.drawContours(color_image, [box], 0, (0, 255, 0), 2)
-
-        self.color_image = color_image
+                result.markers[int(markerID)] = (self.cX, self.cY)
+                result.marker_corners[int(markerID)] = corners
+                self.tracker.update(("marker", int(markerID)), corners.mean(axis=0), result.stamp)
+                self.marker_id = int(markerID)
+
+    def _panel_detection(self, color_image, offset, result):
+        panels = find_panels(color_image, self.min_panel_area, offset=offset, min_score=self.min_panel_score,
+                             aspect=self.panel_aspect)
+        if not panels:
+            return
+        result.panels = panels
+        result.panel = panels[0]
+        self.panel = panels[0]
+
+        # associate each panel with the previous frame's panel whose centre is closest
+        previous = dict(self.panel_keys)
+        keys = {}
+        for i, panel in enumerate(panels):
+            key = None
+            if previous:
+                candidates = list(previous)
+                centres = np.array([previous[k] for k in candidates])
+                dist = np.linalg.norm(centres - panel.center, axis=1)
+                if dist.min() <= self.panel_match_radius:
+                    key = candidates[int(np.argmin(dist))]
+                    del previous[key]
+            if key is None:
+                key = ("panel", self._next_panel)
+                self._next_panel += 1
+            keys[key] = panel.center
+            self.tracker.update(key, panel.probe_points(), result.stamp)
+            if i == 0:
+                self.panel_key = key
+        self.panel_keys = keys
+
+    def check_reference(self):
+        # raises RuntimeError when stream pixels cannot be mapped onto the calibration pixels: without
+        # the intrinsics of both modes only a mode with the reference aspect ratio can be scaled onto it
+        if self._map_intrinsics() is not None:
+            return
+        ref_w, ref_h = self.reference_size
+        if abs(self.width / self.height - ref_w / ref_h) > self.aspect_tolerance * ref_w / ref_h:
+            raise RuntimeError(f"{self.width}x{self.height} cannot be mapped onto the {ref_w}x{ref_h} "
+                               f"calibration without the stream intrinsics")
+
+    def _map_intrinsics(self):
+        # (current, reference) intrinsics when both are known and the modes differ, None otherwise
+        if self.intrinsics is None or self.reference_intrinsics is None:
+            return None
+        if (self.width, self.height) == tuple(self.reference_size):
+            return None
+        return self.intrinsics, self.reference_intrinsics
+
+    def to_reference(self, points):
+        # current stream pixels -> reference_size pixels, raises RuntimeError when they cannot be mapped
+        self.check_reference()
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        intrinsics = self._map_intrinsics()
+        if intrinsics is not None:
+            # same ray, pixels of the other mode: 16:9 and 16:10 modes see a different part of the scene
+            return project_normalized(normalize_pixels(pts, intrinsics[0]), intrinsics[1])
+        return pts * np.array([self.reference_size[0] / self.width, self.reference_size[1] / self.height])
+
+    def from_reference(self, points):
+        self.check_reference()
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        intrinsics = self._map_intrinsics()
+        if intrinsics is not None:
+            return project_normalized(normalize_pixels(pts, intrinsics[1]), intrinsics[0])
+        return pts * np.array([self.width / self.reference_size[0], self.height / self.reference_size[1]])
+
+    def marker_position(self, timeout=2.0):
+        # settled centre of the last seen marker in reference pixels, None if it did not converge in time
+        if self.marker_id is None:
+            return None
+        position = self.tracker.wait_settled(("marker", self.marker_id), timeout)
+        return None if position is None else self.to_reference(position)[0]
+
+    def panel_points(self, timeout=2.0):
+        # settled (9, 2) probe points in reference pixels, None if the panel estimate did not converge in time
+        if self.panel_key is None:
+            return None
+        points = self.tracker.wait_settled(self.panel_key, timeout)
+        return None if points is None else self.to_reference(points)
+
+    def all_panel_points(self, timeout=2.0):
+        # settled (9, 2) probe points of every panel in view in reference pixels, best panel first
+        keys = sorted(self.panel_keys, key=lambda k: k != self.panel_key)
+        if not keys:
+            return None
+        positions = self.tracker.wait_all_settled(keys, timeout)
+        return None if positions is None else [self.to_reference(positions[k]) for k in keys]
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+from threading import Thread, Event
+
+
+class FrameRing:
+    def __init__(self, shape, dtype=np.uint8, size=4):
+        # fixed set of preallocated frame buffers, written round-robin by a single producer
+        self.size = size
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.buffers = [np.zeros(shape, dtype=dtype) for _ in range(size)]
+        self.stamps = np.zeros(size)
+        # sequence number held by each slot, -1 while the producer is writing into it
+        self.slot_seq = np.full(size, -1, dtype=np.int64)
+
+        # newest published sequence number, a single int assignment is the publication point
+        self.seq = -1
+        self._writing = 0
+
+        # set on every publish so consumers can sleep until a frame arrives instead of polling
+        self.new_frame = Event()
+
+    def write_slot(self):
+        # hand out the slot after the newest one and mark it as being written
+        self._writing = (self.seq + 1) % self.size
+        self.slot_seq[self._writing] = -1
+        return self.buffers[self._writing]
+
+    def publish(self, stamp):
+        seq = self.seq + 1
+        self.stamps[self._writing] = stamp
+        self.slot_seq[self._writing] = seq
+        self.seq = seq
+        self.new_frame.set()
+
+    def reader(self):
+        return FrameReader(self)
+
+
+class FrameReader:
+    def __init__(self, ring: FrameRing):
+        # one cursor per consumer (display, detection, recording) so counters stay independent
+        self.ring = ring
+        self.last_seq = -1
+        self.dropped = 0  # frames published but never seen by this consumer
+        self.stale = 0  # reads that found no frame newer than the last one
+
+    def latest(self, out=None):
+        # returns (frame, seq, stamp) of the newest frame, or None if nothing newer is ready
+        # without out the frame is a read-only view that stays valid for ring.size - 1 frames
+        ring = self.ring
+        while True:
+            seq = ring.seq
+            if seq < 0 or seq == self.last_seq:
+                self.stale += 1
+                return None
+            slot = seq % ring.size
+            if out is None:
+                frame = ring.buffers[slot].view()
+                frame.flags.writeable = False
+            else:
+                np.copyto(out, ring.buffers[slot])
+                frame = out
+            stamp = ring.stamps[slot]
+            # the producer lapped us while reading, retry with the new newest frame
+            if ring.slot_seq[slot] != seq:
+                continue
+            if self.last_seq >= 0:
+                self.dropped += seq - self.last_seq - 1
+            self.last_seq = seq
+            return frame, seq, stamp
+
+
+class CaptureThread(Thread):
+    def __init__(self, ring: FrameRing, grab):
+        # grab(out) fills out with the next frame and returns True, False on a missed frame
+        # or None when the source has ended
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.grab = grab
+        self._stop_event = Event()
+
+        self.frames = 0
+        self.errors = 0
+        self.fps = 0.0
+
+    def run(self):
+        t_rate = time.monotonic()
+        n_rate = 0
+        while not self._stop_event.is_set():
+            out = self.ring.write_slot()
+            try:
+                ok = self.grab(out)
+            except RuntimeError:
+                # frame timeout from the sdk, keep the thread alive
+                self.errors += 1
+                continue
+            if ok is None:
+                break
+            if not ok:
+                self.errors += 1
+                continue
+            now = time.monotonic()
+            self.ring.publish(now)
+            self.frames += 1
+
+            n_rate += 1
+            if now - t_rate >= 1.0:
+                self.fps = n_rate / (now - t_rate)
+                t_rate = now
+                n_rate = 0
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import hashlib
+import time
+import signal
+import argparse
+from queue import Empty
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StationConfig:
+    def __init__(self, name, robot_ip, sensor_port, camera_serial=None,
+                 calibration="vision_api/calibration_data.csv", model_cache=None, store=None,
+                 metrics_port=None, profile=None, probe_standoff=None, keep_out=(), blend=50):
+        # one robot / camera / sensor cell. model_cache is a directory shared between cells,
+        # the fitted model is keyed by the calibration file's full path so cells on one csv fit it once
+        self.name = name
+        self.robot_ip = robot_ip
+        self.sensor_port = sensor_port
+        self.camera_serial = camera_serial
+        self.calibration = calibration
+        self.model_cache = model_cache
+        self.store = store or os.path.join("measurements", name)
+        self.metrics_port = metrics_port
+        self.profile = profile
+        self.probe_standoff = probe_standoff
+        self.keep_out = [tuple(zone) for zone in keep_out]
+        self.blend = blend
+
+    @property
+    def model_file(self):
+        if self.model_cache is None:
+            return None
+        # the name alone is ambiguous, a/calibration_data.csv and b/calibration_data.csv are two calibrations
+        path = os.path.realpath(self.calibration)
+        key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.model_cache, f"{os.path.splitext(os.path.basename(path))[0]}_{key}.npz")
+
+    @staticmethod
+    def from_dict(data, defaults=None):
+        return StationConfig(**{**(defaults or {}), **data})
+
+
+def load_stations(path):
+    # {"defaults": {...}, "stations": [{"name": ..., "robot_ip": ..., "sensor_port": ...}, ...]}
+    with open(path) as f:
+        data = json.load(f)
+    defaults = data.get("defaults", {})
+    stations = [StationConfig.from_dict(station, defaults) for station in data["stations"]]
+
+    # two cells driving one device would fight over it, refuse the file instead
+    for field in ("name", "robot_ip", "sensor_port", "camera_serial", "store", "metrics_port"):
+        values = [getattr(s, field) for s in stations if getattr(s, field) is not None]
+        duplicates = {v for v in values if values.count(v) > 1}
+        if duplicates:
+            raise ValueError(f"{path}: {field} used by more than one station: {sorted(map(str, duplicates))}")
+    # without a serial every cell would open the first RealSense
+    if len(stations) > 1:
+        missing = [s.name for s in stations if s.camera_serial is None]
+        if missing:
+            raise ValueError(f"{path}: camera_serial is required with more than one station, missing for {missing}")
+    return stations
+
+
+def run_station(station: StationConfig, cycles, interval, max_failures, stop, results):
+    # worker process entry: the whole capture, detection and motion pipeline of one cell lives here.
+    # every measured panel is posted to results as (station, row, thicknesses), returns a summary
+    from engine import CellEngine
+    from metrics import MetricsRegistry, MetricsServer, register_engine
+
+    # the scheduler owns shutdown, Ctrl+C in the terminal must not kill a cell mid-tour
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if station.model_cache is not None:
+        os.makedirs(station.model_cache, exist_ok=True)
+    engine = CellEngine(robot_ip=station.robot_ip, sensor_port=station.sensor_port,
+                        camera_serial=station.camera_serial, calibration_file=station.calibration,
+                        model_file=station.model_file, store_path=station.store,
+                        probe_standoff=station.probe_standoff, keep_out=station.keep_out, blend=station.blend)
+    engine.on_panel = lambda row, values: results.put((station.name, row, values))
+    errors = []
+    server = None
+    if station.metrics_port is not None:
+        registry = MetricsRegistry(labels={"cell": station.name})
+        register_engine(registry, engine)
+        server = MetricsServer(registry, port=station.metrics_port)
+    try:
+        engine.check_calibration()
+        if station.profile:
+            engine.set_profile(station.profile)
+        engine.open_camera()
+        engine.connect_robot()
+        ok = engine.run_cycles(cycles, interval, stop, max_failures,
+                               on_error=lambda cycle, e: errors.append(f"cycle {cycle}: {e}"))
+    except (ValueError, FileNotFoundError, TimeoutError, RuntimeError, OSError) as e:
+        errors.append(str(e))
+        ok = False
+    finally:
+        engine.close()
+        if server is not None:
+            server.close()
+    return {
+        "station": station.name,
+        "ok": ok,
+        "cycles": engine.cycles,
+        "failed_cycles": engine.failed_cycles,
+        "panels": engine.panel_count,
+        "mean_cycle_s": engine.cycle_total / engine.cycles if engine.cycles else None,
+        "errors": errors[-10:],
+    }
+
+
+class CellScheduler:
+    def __init__(self, stations, cycles=0, interval=0.0, max_failures=3):
+        # one worker process per station, the cells share nothing but the calibration model cache
+        self.stations = stations
+        self.cycles = cycles
+        self.interval = interval
+        self.max_failures = max_failures
+
+        # aggregated over all cells, filled from the result queue
+        self.panels = {s.name: 0 for s in stations}
+        self.thickness_sum = {s.name: 0.0 for s in stations}
+        self._stop = None
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    def run(self, on_panel=None):
+        # blocks until every cell is done, on_panel(station, row, thicknesses) runs in this process
+        # returns {station: summary}, a cell that crashed reports its exception instead
+        summaries = {}
+        with Manager() as manager:
+            self._stop = manager.Event()
+            results = manager.Queue()
+            with ProcessPoolExecutor(max_workers=len(self.stations)) as pool:
+                futures = {pool.submit(run_station, s, self.cycles, self.interval, self.max_failures,
+                                       self._stop, results): s.name for s in self.stations}
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    self._drain(results, on_panel)
+                    for future in done:
+                        name = futures[future]
+                        try:
+                            summaries[name] = future.result()
+                        except Exception as e:
+                            summaries[name] = {"station": name, "ok": False, "errors": [repr(e)]}
+                self._drain(results, on_panel)
+            self._stop = None
+        return summaries
+
+    def _drain(self, results, on_panel):
+        while True:
+            try:
+                name, row, values = results.get_nowait()
+            except Empty:
+                return
+            self.panels[name] += 1
+            self.thickness_sum[name] += sum(values) / len(values)
+            if on_panel is not None:
+                on_panel(name, row, values)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several measuring cells in parallel from a station file")
+    parser.add_argument("config", help="json station file")
+    parser.add_argument("--cycles", type=int, default=0, help="tours per cell, 0 runs until SIGTERM / Ctrl+C")
+    parser.add_argument("--interval", type=float, default=0.0, help="minimum seconds between tour starts")
+    parser.add_argument("--max-failures", type=int, default=3, help="consecutive failed tours before a cell stops")
+    parser.add_argument("--summary", help="write the per-cell summary to this json file")
+    args = parser.parse_args(argv)
+
+    try:
+        stations = load_stations(args.config)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    scheduler = CellScheduler(stations, args.cycles, args.interval, args.max_failures)
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    signal.signal(signal.SIGINT, lambda *_: scheduler.stop())
+    t0 = time.monotonic()
+    summaries = scheduler.run(on_panel=lambda name, row, values: print(f"{name} panel {row}: {values}", flush=True))
+
+    elapsed = time.monotonic() - t0
+    total = sum(scheduler.panels.values())
+    for name, summary in summaries.items():
+        panels = scheduler.panels[name]
+        mean = f", mean {scheduler.thickness_sum[name] / panels:.2f} mm" if panels else ""
+        print(f"{name}: {'ok' if summary['ok'] else 'FAILED'}, {panels} panels, "
+              f"{summary.get('cycles', 0)} tours{mean}", *summary["errors"][-1:])
+    print(f"{total} panels from {len(stations)} cells in {elapsed:.1f} s ({total / elapsed * 60:.1f} panels/min)")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump({"elapsed_s": elapsed, "panels": total, "stations": summaries}, f, indent=2)
+    return 0 if all(s["ok"] for s in summaries.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
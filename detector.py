@@ -0,0 +1,59 @@
+import time
+import numpy as np
+from threading import Thread
+
+
+class DetectionPool:
+    def __init__(self, cam, callback):
+        # runs Camera.detect off the gui thread, callback(result) is called from the worker thread.
+        # One thread only: detect updates the camera's marker window, tracker and panel association,
+        # which are not safe to run concurrently
+        self.cam = cam
+        self.callback = callback
+
+        self._reader = None
+        self._thread = None
+        self._running = False
+
+        self.processed = 0
+        self.latency = 0.0  # capture to result, seconds
+        self.detect_time = 0.0  # Camera.detect alone, seconds
+
+    @property
+    def dropped(self):
+        # frames skipped because the worker was busy
+        return self._reader.dropped if self._reader is not None else 0
+
+    def start(self):
+        if self._running:
+            return
+        self._reader = self.cam.ring.reader()
+        self._running = True
+        self._thread = Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _work(self):
+        ring = self.cam.ring
+        # private copy so a slow detection never reads a ring slot the producer is refilling
+        buffer = np.empty(ring.shape, dtype=ring.dtype)
+        while self._running:
+            if not ring.new_frame.wait(0.1):
+                continue
+            # only the newest frame is taken, older ones are dropped under backpressure
+            ring.new_frame.clear()
+            latest = self._reader.latest(out=buffer)
+            if latest is None:
+                continue
+
+            t0 = time.monotonic()
+            result = self.cam.detect(*latest)
+            self.detect_time = time.monotonic() - t0
+            self.processed += 1
+            self.latency = time.monotonic() - result.stamp
+            self.callback(result)
@@ -0,0 +1,371 @@
+import sys
+import time
+import signal
+import argparse
+from threading import Thread, Event, Lock
+import numpy as np
+from vision_api.camera import Camera
+from vision_api.detector import DetectionPool
+from vision_api.handeye_calibration import Calibration
+from vision_api.sensor import Sensor
+from robot_api.robot import RobotExec
+from measurement import PanelRun
+from measurement_store import MeasurementStore
+from auto_calibration import AutoCalibration
+from metrics import MetricsRegistry, MetricsServer, register_engine
+
+
+class CellEngine:
+    def __init__(self, robot_ip="192.168.1.6", sensor_port="COM6", camera_serial=None,
+                 calibration_file="vision_api/calibration_data.csv", model_file=None, store_path="measurements",
+                 home=(275, -30, 130, 46), probe_z=-166, retract_z=-150, r=46, probe_standoff=None,
+                 keep_out=(), blend=50):
+        # the camera -> calibration -> robot -> sensor pipeline without any gui. Nothing is opened
+        # here, each device comes up the first time something needs it
+        self.robot_ip = robot_ip
+        self.sensor_port = sensor_port
+        self.camera_serial = camera_serial
+        self.calibration_file = calibration_file
+        self.store_path = store_path
+
+        # task geometry (mm, degrees), probe_standoff above the depth-measured surface, None keeps probe_z
+        self.home = home
+        self.probe_z = probe_z
+        self.retract_z = retract_z
+        self.r = r
+        self.probe_standoff = probe_standoff
+        # (xmin, ymin, zmin, xmax, ymax, zmax) boxes the tool must pass over, and the CP blend ratio (%)
+        self.keep_out = keep_out
+        self.blend = blend
+
+        self._cam = None
+        self._sensor = None
+        self._store = None
+        self.calib = Calibration(calibration_file, model_file=model_file)
+        self.detector = None
+        self.camera_status = False
+
+        self.robot = RobotExec(robot_ip)
+        self.robot_status = False
+        self.dashboard = None
+        self.move = None
+        self.feed = None
+        # held by the one task driving the robot (a tour or auto-calibration), a second one is refused
+        self._task_lock = Lock()
+
+        # callbacks, called from worker threads: on_detection(result), on_panel(row, thicknesses)
+        self.on_detection = None
+        self.on_panel = None
+        self.panel_count = 0
+
+        # tour statistics: duration of the last completed tour and totals over all of them (s)
+        self.cycles = 0
+        self.failed_cycles = 0
+        self.cycle_time = 0.0
+        self.cycle_total = 0.0
+
+    # ============================ Lazy devices ============================
+    @property
+    def cam(self):
+        if self._cam is None:
+            self._cam = Camera(self.camera_serial)
+        return self._cam
+
+    @property
+    def sensor(self):
+        # opening the serial port is deferred to the first measurement
+        if self._sensor is None:
+            self._sensor = Sensor(self.sensor_port)
+            self._sensor.start_reader()
+        return self._sensor
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = MeasurementStore(self.store_path)
+        return self._store
+
+    # ============================ Camera ============================
+    def open_camera(self):
+        if self.camera_status:
+            return
+        self.cam.enable_camera()
+        self.detector = DetectionPool(self.cam, self._publish_detection)
+        self.detector.start()
+        self.camera_status = True
+
+    def close_camera(self):
+        if not self.camera_status:
+            return
+        self.detector.stop()
+        self.cam.disable_camera()
+        self.camera_status = False
+
+    def set_profile(self, name):
+        # returns the negotiated (width, height, fps), readers of the old ring must be rebuilt
+        if not self.camera_status:
+            self.cam.width, self.cam.height, self.cam.fps = Camera.PROFILES[name]
+            return self.cam.width, self.cam.height, self.cam.fps
+        self.detector.stop()
+        mode = self.cam.set_profile(name)
+        self.detector = DetectionPool(self.cam, self._publish_detection)
+        self.detector.start()
+        return mode
+
+    def _publish_detection(self, result):
+        if self.on_detection is not None:
+            self.on_detection(result)
+
+    # ============================ Robot ============================
+    def connect_robot(self):
+        if self.robot_status:
+            return
+        self.dashboard, self.move, self.feed = self.robot.connect_robot()
+        Thread(target=self.robot.get_feed, args=(self.feed,), daemon=True).start()
+        self.dashboard.EnableRobot()
+        self.robot_status = True
+
+    def disconnect_robot(self):
+        if not self.robot_status:
+            return
+        self.dashboard.DisableRobot()
+        self.robot.stop_feed()
+        self.dashboard.socket_dobot.close()
+        self.move.socket_dobot.close()
+        self.feed.socket_dobot.close()
+        self.robot_status = False
+
+    def enable_robot(self, enable):
+        if not self.robot_status:
+            return
+        if enable:
+            self.dashboard.EnableRobot()
+        else:
+            self.dashboard.DisableRobot()
+
+    # ============================ Calibration ============================
+    def check_calibration(self):
+        # raises ValueError / FileNotFoundError when the fit is missing or not good enough
+        return self.calib.validate()
+
+    def reload_calibration(self):
+        self.calib.invalidate()
+        return self.calib.validate()
+
+    def auto_calibrate(self, progress=None):
+        # progress(index, marker_x, marker_y, robot_x, robot_y) after every pair, returns the fitted model
+        # refused up front rather than after the robot has toured the grid
+        self.cam.check_reference()
+        self._begin_task()
+        try:
+            self.dashboard.ClearError()
+            self.dashboard.EnableRobot()
+            routine = AutoCalibration(self.robot, self.move, self.cam, self.calib, z=self.retract_z, r=self.r,
+                                      progress=progress)
+            return routine.run()
+        finally:
+            self._task_lock.release()
+
+    # ============================ Task ============================
+    @property
+    def busy(self):
+        # True while a tour or auto-calibration is driving the robot
+        return self._task_lock.locked()
+
+    def _begin_task(self):
+        if not self._task_lock.acquire(blocking=False):
+            raise RuntimeError("Another robot task is still running")
+
+    def measure(self, settle_timeout=3.0):
+        # one tour over every panel in view, stored and reported panel by panel
+        # raises TimeoutError / RuntimeError, ConnectionError when the robot feed is lost,
+        # returns the ProbeResults per panel
+        self._begin_task()
+        t0 = time.monotonic()
+        try:
+            results = self._measure(settle_timeout)
+        except Exception:
+            self.failed_cycles += 1
+            raise
+        finally:
+            self._task_lock.release()
+        self.cycle_time = time.monotonic() - t0
+        self.cycle_total += self.cycle_time
+        self.cycles += 1
+        return results
+
+    def _measure(self, settle_timeout):
+        self.cam.check_reference()
+        panels = self.cam.all_panel_points(timeout=settle_timeout)
+        if panels is None:
+            raise RuntimeError("Panel position did not settle.")
+        panels_robot_pts = [self.calib.transfer_points(points) for points in panels]
+        panels_probe_z = self.probe_heights(panels)
+        calib_version = self.calib.get_model().version
+
+        # every panel in view is measured in one precomputed tour, blended between probes and
+        # hopping only as high as the clearance and the keep-out zones need
+        run = PanelRun(self.robot, self.move, self.sensor, probe_z=self.probe_z, retract_z=self.retract_z, r=self.r,
+                       dashboard=self.dashboard)
+        run.move_wait(*self.home)
+        results = run.run_path(panels_robot_pts, self.home, panels_probe_z, keep_out=self.keep_out, blend=self.blend)
+
+        # output pulse on the centre of the best panel, reached and left through the keep-out checks too
+        x, y = panels_robot_pts[0][4]
+        z = self.probe_z if panels_probe_z is None else panels_probe_z[0][4]
+        run.pulse_at(x, y, z, self.home, keep_out=self.keep_out)
+
+        for panel_results in results:
+            self.store.append(panel_results, calib_version)
+            if self.on_panel is not None:
+                self.on_panel(self.panel_count, [round(float(p.thickness), 2) for p in panel_results])
+            self.panel_count += 1
+        return results
+
+    def probe_heights(self, panels):
+        # per-point probe Z from one aligned depth frame, None keeps the fixed probe height
+        if self.probe_standoff is None:
+            return None
+        heights = []
+        for points in panels:
+            xyz = self.cam.deproject(self.cam.from_reference(points))
+            if xyz is None or np.isnan(xyz[:, 2]).any():
+                return None
+            surface_z = self.calib.depth_to_robot_z(xyz[:, 2])
+            if surface_z is None:
+                return None
+            heights.append(surface_z + self.probe_standoff)
+        return heights
+
+    def run_cycles(self, cycles=1, interval=0.0, stop=None, max_failures=3, on_error=None):
+        # repeated tours until cycles are done (0 = until stop is set) or max_failures tours in a row fail
+        # interval is the minimum time between tour starts. returns False when it gave up on failures,
+        # a lost robot feed (ConnectionError) ends the loop at once
+        stop = stop or Event()
+        failures = 0
+        cycle = 0
+        while not stop.is_set() and (cycles == 0 or cycle < cycles):
+            t0 = time.monotonic()
+            try:
+                self.measure()
+                failures = 0
+            except (TimeoutError, RuntimeError) as e:
+                failures += 1
+                if on_error is not None:
+                    on_error(cycle, e)
+                if failures >= max_failures:
+                    return False
+            cycle += 1
+            stop.wait(max(interval - (time.monotonic() - t0), 0.0))
+        return True
+
+    def export(self, filename):
+        # returns the number of panels written
+        if filename.endswith(".parquet"):
+            return self.store.export_parquet(filename)
+        return self.store.export_csv(filename)
+
+    def close(self):
+        self.close_camera()
+        self.disconnect_robot()
+        if self._sensor is not None:
+            self._sensor.stop_reader()
+            self._sensor.close()
+        if self._store is not None:
+            self._store.close()
+
+
+# ============================ Command line ============================
+def _engine_from_args(args):
+    return CellEngine(robot_ip=args.robot_ip, sensor_port=args.sensor_port, camera_serial=args.camera_serial,
+                      calibration_file=args.calibration, store_path=args.store, probe_standoff=args.probe_standoff)
+
+
+def _run_measure(engine, args):
+    # unattended loop for a supervisor: SIGTERM / Ctrl+C finish the current tour, then exit.
+    # SIGTERM is the supervisor's normal stop, Ctrl+C exits with 130 so an interrupted run is not a success
+    stop = Event()
+    interrupted = Event()
+
+    def on_interrupt(*_):
+        interrupted.set()
+        stop.set()
+
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, on_interrupt)
+    engine.on_panel = lambda row, values: print(f"panel {row}: {values}", flush=True)
+    engine.check_calibration()
+    if args.profile:
+        engine.set_profile(args.profile)
+    engine.open_camera()
+    engine.connect_robot()
+    ok = engine.run_cycles(args.cycles, args.interval, stop, args.max_failures,
+                           on_error=lambda cycle, e: print(f"cycle {cycle}: {e}", file=sys.stderr, flush=True))
+    if interrupted.is_set():
+        print("interrupted", file=sys.stderr)
+        return 130
+    return 0 if ok else 1
+
+
+def _run_calibrate(engine, args):
+    engine.open_camera()
+    engine.connect_robot()
+    model = engine.auto_calibrate(progress=lambda i, mx, my, rx, ry:
+                                  print(f"pair {i}: marker [{mx:.1f}, {my:.1f}] robot [{rx:.1f}, {ry:.1f}]"))
+    print(f"{model.kind} fit over {len(model.residuals)} pairs, RMS error {model.rms:.2f} mm")
+    return 0
+
+
+def _run_export(engine, args):
+    # touches only the store, no device is opened
+    print(f"{engine.export(args.filename)} panels saved in {args.filename}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless film thickness cell")
+    parser.add_argument("--robot-ip", default="192.168.1.6")
+    parser.add_argument("--sensor-port", default="COM6")
+    parser.add_argument("--camera-serial", default=None, help="RealSense serial number, the first camera without it")
+    parser.add_argument("--calibration", default="vision_api/calibration_data.csv")
+    parser.add_argument("--store", default="measurements")
+    parser.add_argument("--probe-standoff", type=float, default=None,
+                        help="probe height above the depth-measured surface (mm), fixed height without it")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on 127.0.0.1:<port>/metrics")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    measure = commands.add_parser("measure", help="measure every panel in view, repeatedly")
+    measure.add_argument("--cycles", type=int, default=1, help="0 runs until SIGTERM")
+    measure.add_argument("--interval", type=float, default=0.0, help="minimum seconds between tour starts")
+    measure.add_argument("--max-failures", type=int, default=3, help="consecutive failed tours before exiting")
+    measure.add_argument("--profile", choices=list(Camera.PROFILES))
+    measure.set_defaults(run=_run_measure)
+
+    calibrate = commands.add_parser("calibrate", help="automatic hand-eye calibration over the robot grid")
+    calibrate.set_defaults(run=_run_calibrate)
+
+    export = commands.add_parser("export", help="export stored measurements to csv or parquet")
+    export.add_argument("filename")
+    export.set_defaults(run=_run_export)
+
+    args = parser.parse_args(argv)
+    engine = _engine_from_args(args)
+    server = None
+    if args.metrics_port is not None:
+        registry = MetricsRegistry()
+        register_engine(registry, engine)
+        server = MetricsServer(registry, port=args.metrics_port)
+    try:
+        return args.run(engine, args)
+    except (ValueError, FileNotFoundError, TimeoutError, RuntimeError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.close()
+        if server is not None:
+            server.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,19 +2,28 @@ import sys
 import csv
 import time
 from threading import Thread
+import numpy as np
 from PyQt5 import QtCore, QtWidgets, QtGui
-from PyQt5.QtWidgets import QMessageBox, QMainWindow, QWidget
+from PyQt5.QtWidgets import QMessageBox, QMainWindow, QWidget, QFileDialog
 from qtwidgets import AnimatedToggle
 
 from vision_api.camera import Camera
-from vision_api.handeye_calibration import Calibration
-from robot_api.robot import RobotExec, DobotApiDashboard, DobotApiMove, DobotApi
+from robot_api.robot import ROBOT_MODE_DISABLED, ROBOT_MODE_ENABLE
 from UI.FTT import Ui_MainWindow
 from UI.calib import Ui_Form
-from vision_api.sensor import Sensor
+from engine import CellEngine
+from metrics import MetricsRegistry, MetricsServer, register_engine
 
 
 class MainUI(QMainWindow, Ui_MainWindow):
+    # raised from the task thread, shown on the gui thread
+    signal_task_error = QtCore.pyqtSignal(str)
+    signal_panel_result = QtCore.pyqtSignal(int, list)
+    signal_calib_pair = QtCore.pyqtSignal(int, float, float, float, float)
+    signal_calib_done = QtCore.pyqtSignal(bool, str)
+    signal_export_done = QtCore.pyqtSignal(bool, str)
+    signal_task_busy = QtCore.pyqtSignal(bool)
+
     def __init__(self):
         super().__init__()
         self.setupUi(self)
@@ -23,95 +32,145 @@ class MainUI(QMainWindow, Ui_MainWindow):
         self.calibration_ui = CalibUI()
         self.calibration_ui.signal_out.connect(self.get_pos_data)
         self.calibration_ui.signal_camera.connect(self.switch_detection_mode)
-
-        # realsense camera
-        self.cam = Camera()
+        self.calibration_ui.signal_robot_pos.connect(self.hold_calibration_pose)
+        self.calibration_ui.signal_auto.connect(self.start_auto_calibration)
+
+        # camera, calibration, robot, sensor and store live in the engine, the window only drives it.
+        # devices are opened on demand, the sensor port at the first measurement
+        self.engine = CellEngine()
+        self.cam = self.engine.cam
+        self.robot = self.engine.robot
+        self.calib = self.engine.calib
+        self.paused = False
+
+        # detection runs on worker threads and posts results back through a queued signal
+        self.detection_bridge = DetectionBridge()
+        self.detection_bridge.signal_result.connect(self.update_detection)
+        self.engine.on_detection = self.detection_bridge.signal_result.emit
+        self.detection_result = None
+
+        # display copies the newest ring frame into its own buffer, paints it into label_image
+        # and draws the overlay on top
         self.timer = QtCore.QTimer()
-        self.camera_status = False
+        self.display_reader = None
+        self.display_buffer = None
+        self.display_image = None
+        self.display_ready = False
+        self.overlay_pen = QtGui.QPen(QtGui.QColor(0, 255, 0), 2)
+        self.point_pen = QtGui.QPen(QtGui.QColor(255, 0, 0), 4)
+        self.label_image.installEventFilter(self)
 
-        # MG400 Robot
-        self.robot = RobotExec()
-        self.robot_status = False
-        self.dashboard: DobotApiDashboard
-        self.move: DobotApiMove
-        self.feed: DobotApi
+        # stream profile selector, switching restarts only the camera pipeline
+        self.profile_box = QtWidgets.QComboBox()
+        self.profile_box.addItems(list(Camera.PROFILES))
+        self.statusBar().addPermanentWidget(self.profile_box)
 
-        # read hand-eye vision_api data
-        self.calib = Calibration("vision_api/calibration_data.csv")
+        self.calibration_ui.signal_calibration.connect(self.reload_calibration)
 
         # initialize thickness gauge table
         self.tableWidget.setColumnCount(10)
         self.tableWidget.setHorizontalHeaderLabels(["Avg", "①", "②", "③", "④", "⑤", "⑥", "⑦", "⑧", "⑨"])
         self.tableWidget.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
         self.tableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.engine.on_panel = self.signal_panel_result.emit
 
         # toggle connections
         self._add_toggles()
 
+        # health metrics: compact panel docked on the right, Prometheus text on localhost for scraping
+        self.metrics = MetricsRegistry()
+        register_engine(self.metrics, self.engine)
+        self.metrics_panel = MetricsPanel(self.metrics)
+        dock = QtWidgets.QDockWidget("Health", self)
+        dock.setWidget(self.metrics_panel)
+        self.addDockWidget(QtCore.Qt.RightDockWidgetArea, dock)
+        try:
+            self.metrics_server = MetricsServer(self.metrics)
+        except OSError:
+            # another instance already serves the port, the panel still works
+            self.metrics_server = None
+
         # slot connections
         self._init_features()
 
-        # deep sensor
-        self.sensor = Sensor("COM6")
+    @property
+    def camera_status(self):
+        return self.engine.camera_status
+
+    @property
+    def robot_status(self):
+        # a paused robot is connected but not available for tasks
+        return self.engine.robot_status and not self.paused
+
+    @property
+    def dashboard(self):
+        return self.engine.dashboard
+
+    @property
+    def move(self):
+        return self.engine.move
 
     # ============================ Start Task & Export Data ============================
     # put your code here
     # walk 9 points and detect film thickness
     # go back to origin after tasks finished
     def start_task(self):
-
-
-        sens = self.sensor.estimate()
-        # sens = distance data retrived from laser sensor.
         if not self.robot_status or not self.camera_status:
             QMessageBox.warning(self, "Task Starting Error",
                                 f"Robot: <{'Not Connected' if not self.robot_status else 'Connected'}>\r"
                                 f"Camera: <{'Not Connected' if not self.camera_status else 'Connected'}>",
                                 QMessageBox.Ok)
 
+        elif self.cam.panel is None:
+            QMessageBox.warning(self, "Task Starting Error", "No panel detected.", QMessageBox.Ok)
+
+        elif not self._check_calibration():
+            return
+
         else:
-            robot_X = []
-            robot_Y = []
-
-            for i in range(9):
-                robot_x, robot_y = self.calib.transfer_camera2robot(self.cam.px[i], self.cam.py[i])
-                robot_X.append(robot_x)
-                robot_Y.append(robot_y)
-
-            self.move.MovL(275, -30, 130, 46)
-            for i in range(9):
-                # self.move.MovL(robot_X[i], robot_Y[i], -172, 46)
-                self.move.MovL(robot_X[i], robot_Y[i], -166, 46)
-                # self.dashboard.DO(1, 1)
-                # time.sleep(1)
-                self.move.MovL(robot_X[i], robot_Y[i], -150, 46)
-
-            self.move.MovL(robot_X[4], robot_Y[4], -166, 46)
-
-            self.dashboard.DO(1, 1)
-            self.dashboard.DO(1, 0)
-            self.move.MovL(275, -30, 130, 46)
-
-
-            #test with code
-            # for i in range(9):
-            #     # self.move.MovL(robot_X[i], robot_Y[i], -172, 46)
-            #     self.move.MovL(robot_X[i], robot_Y[i], -123, 46)
-            #     # self.dashboard.DO(1, 1)
-            #     # time.sleep(1)
-            #     self.move.MovL(robot_X[i], robot_Y[i], -100, 46)
-            #
-            # self.dashboard.DO(1, 0)
-            # self.move.MovL(275, -30, 130, 46)
-
-            # use for test
-            # robot_x, robot_y = self.calib.transfer_camera2robot(494, 172)
-            # self.move.MovL(robot_x, robot_y, -123, 46)
-            # time.sleep(5)
-            # self.move.MovL(275, -30, 130, 46)
+            # the walk waits on the tracker and the feed, keep it off the gui thread
+            self.set_task_busy(True)
+            Thread(target=self._walk_points, daemon=True).start()
+
+    def _walk_points(self):
+        # the engine stores every panel and reports it through signal_panel_result
+        try:
+            self.engine.measure()
+        except (TimeoutError, RuntimeError, OSError) as e:
+            # OSError: the sensor port is opened here on the first run
+            self.signal_task_error.emit(str(e))
+        finally:
+            self.signal_task_busy.emit(False)
+
+    def set_task_busy(self, busy):
+        # one robot task at a time, the engine refuses a second one too
+        self.Button_start.setEnabled(not busy)
+        self.calibration_ui.Button_auto.setEnabled(not busy)
+
+    def show_task_error(self, message):
+        QMessageBox.warning(self, "Task Error", message, QMessageBox.Ok)
 
     def export_measurement_data(self):
-        pass
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Measurement Data", "measurements.csv",
+                                                  "CSV (*.csv);;Parquet (*.parquet)")
+        if not filename:
+            return
+        # a shift is thousands of panels, stream them out off the gui thread
+        Thread(target=self._export, args=(filename,), daemon=True).start()
+
+    def _export(self, filename):
+        try:
+            count = self.engine.export(filename)
+        except (OSError, ImportError) as e:
+            self.signal_export_done.emit(False, str(e))
+            return
+        self.signal_export_done.emit(True, f"{count} panels saved in {filename}")
+
+    def show_export_done(self, ok, message):
+        if ok:
+            QMessageBox.information(self, "Export Measurement Data", message, QMessageBox.Ok)
+        else:
+            QMessageBox.warning(self, "Export Error", message, QMessageBox.Ok)
 
     def test_insert(self):
         self.tableWidget.setRowCount(3)
@@ -122,62 +181,118 @@ class MainUI(QMainWindow, Ui_MainWindow):
         self.insert_data(0, [56, 67, 78, 47, 95, 13, 80, 30, 55])
 
     def insert_data(self, panel_num, data: list):
+        if self.tableWidget.rowCount() <= panel_num:
+            self.tableWidget.setRowCount(panel_num + 1)
         for i in range(1, 10):
-            self.tableWidget.setItem(0, i, QtWidgets.QTableWidgetItem(str(data[i-1])))
+            self.tableWidget.setItem(panel_num, i, QtWidgets.QTableWidgetItem(str(data[i-1])))
         self.tableWidget.setItem(panel_num, 0, QtWidgets.QTableWidgetItem(str(round(sum(data)/len(data), 1))))
 
     # ============================ Realsense D455i Camera Features ============================
     def load_stream(self):
         try:
             if not self.camera_status:
-                if not self.timer.isActive():
-                    self.cam.enable_camera()
-                    self.timer.start(30)
-                    self.camera_status = True
+                if not self.cam.capture:
+                    self.engine.open_camera()
+                    self._init_display()
+                    self.timer.start(10)
                     self.Button_camera.setText("Close Camera")
                     self.label_camera_status.setStyleSheet("background-color: green")
             else:
                 self.close_camera()
-                self.camera_status = False
                 self.Button_camera.setText("Open Camera")
                 self.label_camera_status.setStyleSheet("background-color: red")
 
         except RuntimeError as e:
             QMessageBox.warning(self, "Camera Error", f"{e}", QMessageBox.Ok)
 
+    def _init_display(self):
+        # one preallocated frame wrapped by one QImage. The capture thread keeps writing into the
+        # ring while a paint runs, so the display never points at ring memory, it paints its own copy
+        ring = self.cam.ring
+        self.display_reader = ring.reader()
+        self.display_buffer = np.empty(ring.shape, dtype=ring.dtype)
+        self.display_image = QtGui.QImage(self.display_buffer.data, ring.shape[1], ring.shape[0],
+                                          self.display_buffer.strides[0], QtGui.QImage.Format_BGR888)
+        self.display_ready = False
+        self.label_image.setMinimumSize(self.cam.width, self.cam.height)
+
     def show_image(self):
-        self.cam.detection()
-        image = QtGui.QImage(self.cam.color_image, 640, 480, QtGui.QImage.Format_BGR888)
-        self.label_image.setPixmap(QtGui.QPixmap.fromImage(image))
+        # the reader retries the copy until it got a frame the producer did not overwrite meanwhile
+        if self.display_reader.latest(out=self.display_buffer) is None:
+            return
+        self.display_ready = True
+        self.label_image.update()
+
+    def update_detection(self, result):
+        # keep the newest frame only, a queued result may arrive after a newer one was shown
+        if self.detection_result is not None and result.seq <= self.detection_result.seq:
+            return
+        self.detection_result = result
+
+    def eventFilter(self, obj, event):
+        if obj is self.label_image and event.type() == QtCore.QEvent.Paint and self.display_ready:
+            painter = QtGui.QPainter(self.label_image)
+            painter.drawImage(0, 0, self.display_image)
+            if self.detection_result is not None:
+                self._paint_overlay(painter, self.detection_result)
+            painter.end()
+            return True
+        return super().eventFilter(obj, event)
+
+    def _paint_overlay(self, painter, result):
+        # vector overlay, the frame used for measurement is never drawn on
+        painter.setPen(self.overlay_pen)
+        for corners in result.marker_corners.values():
+            painter.drawPolygon(QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in corners]))
+        if result.panel is not None:
+            painter.drawPolygon(QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in result.panel.corners]))
+        for cX, cY in result.markers.values():
+            painter.drawText(cX + 40, cY, f"[{cX}, {cY}]")
+
+        painter.setPen(self.point_pen)
+        for cX, cY in result.markers.values():
+            painter.drawPoint(cX, cY)
+        if result.panel is not None:
+            for x, y in result.panel.probe_points():
+                painter.drawPoint(QtCore.QPointF(x, y))
+
+    def switch_profile(self, name):
+        try:
+            if not self.camera_status:
+                self.engine.set_profile(name)
+                return
+            self.timer.stop()
+            mode = self.engine.set_profile(name)
+            self._init_display()
+            self.detection_result = None
+            self.timer.start(10)
+            self.statusBar().showMessage(f"Stream {mode[0]}x{mode[1]} @ {mode[2]} fps", 3000)
+        except RuntimeError as e:
+            QMessageBox.warning(self, "Camera Error", f"{e}", QMessageBox.Ok)
 
     def switch_detection_mode(self):
-        self.cam.calibration_status = False
+        self.cam.mode = Camera.MODE_PANEL
 
     def close_camera(self):
         self.timer.stop()
-        self.cam.config.disable_all_streams()
-        self.cam.pipeline.stop()
+        self.engine.close_camera()
+        self.detection_result = None
+        self.display_ready = False
 
     # ============================ MG400 Features ============================
     def control_robot(self):
         try:
-            if not self.robot_status:
-                self.dashboard, self.move, self.feed = self.robot.connect_robot()
-                Thread(target=self.robot.get_feed, args=(self.feed,), daemon=True).start()
-                self.dashboard.EnableRobot()
+            if not self.engine.robot_status:
+                self.engine.connect_robot()
+                self.paused = False
                 self.check_robot_mode()
 
-                self.robot_status = True
                 self.Button_robot.setText("Disconnect Robot")
                 self.label_robot_status.setStyleSheet("background-color: green")
             else:
-                self.dashboard.DisableRobot()
-                self.check_robot_mode()
-                self.dashboard.socket_dobot.close()
-                self.move.socket_dobot.close()
-                self.feed.socket_dobot.close()
+                self.engine.disconnect_robot()
+                self.enable_robot_toggle.setCheckState(QtCore.Qt.Unchecked)
 
-                self.robot_status = False
                 self.Button_robot.setText("Connect Robot")
                 self.label_robot_status.setStyleSheet("background-color: red")
 
@@ -186,18 +301,18 @@ class MainUI(QMainWindow, Ui_MainWindow):
 
     def enable_switch_robot(self):
         if self.enable_robot_toggle.isChecked():
-            if self.robot_status:
-                self.dashboard.EnableRobot()
+            self.engine.enable_robot(True)
             self.enable_robot_toggle.setCheckState(QtCore.Qt.Checked)
         else:
-            if self.robot_status:
-                self.dashboard.DisableRobot()
+            self.engine.enable_robot(False)
             self.enable_robot_toggle.setCheckState(QtCore.Qt.Unchecked)
 
     def check_robot_mode(self):
-        if self.robot.feed_data["robot_mode"][0] == 5:
+        if self.robot.feed_data is None:
+            return
+        if self.robot.feed_data["robot_mode"][0] == ROBOT_MODE_ENABLE:
             self.enable_robot_toggle.setCheckState(QtCore.Qt.Checked)
-        elif self.robot.feed_data["robot_mode"][0] == 4:
+        elif self.robot.feed_data["robot_mode"][0] == ROBOT_MODE_DISABLED:
             self.enable_robot_toggle.setCheckState(QtCore.Qt.Unchecked)
 
     # ============================ Hand-Eye Calibration ============================
@@ -214,13 +329,77 @@ class MainUI(QMainWindow, Ui_MainWindow):
                                         QMessageBox.Yes, QMessageBox.No)
             if reply == QMessageBox.Yes:
                 self.calibration_ui.show()
-                self.cam.calibration_status = True
+                self.cam.mode = Camera.MODE_ARUCO
+
+    def _check_calibration(self):
+        try:
+            self.engine.check_calibration()
+            return True
+        except (ValueError, FileNotFoundError) as e:
+            QMessageBox.warning(self, "Calibration Error", f"{e}", QMessageBox.Ok)
+            return False
+
+    def reload_calibration(self):
+        # refit from the freshly exported pairs and report the fit quality
+        self.engine.calib.invalidate()
+        if self._check_calibration():
+            model = self.calib.get_model()
+            QMessageBox.information(self, "Hand-eye Calibration",
+                                    f"{model.kind} fit over {len(model.residuals)} pairs\r"
+                                    f"RMS error: {model.rms:.2f} mm\r"
+                                    f"Max residual: {model.residuals.max():.2f} mm", QMessageBox.Ok)
+
+    def start_auto_calibration(self):
+        if not self.robot_status or not self.camera_status:
+            QMessageBox.warning(self, "Calibration Error", "Robot and camera must be connected.", QMessageBox.Ok)
+            return
+        self.set_task_busy(True)
+        Thread(target=self._run_auto_calibration, daemon=True).start()
+
+    def _run_auto_calibration(self):
+        try:
+            model = self.engine.auto_calibrate(progress=self.signal_calib_pair.emit)
+        except (TimeoutError, RuntimeError, ValueError) as e:
+            self.signal_calib_done.emit(False, str(e))
+            return
+        finally:
+            self.signal_task_busy.emit(False)
+        self.signal_calib_done.emit(True, f"{model.kind} fit over {len(model.residuals)} pairs\r"
+                                          f"RMS error: {model.rms:.2f} mm")
+
+    def show_calibration_done(self, ok, message):
+        if ok:
+            QMessageBox.information(self, "Hand-eye Calibration", message, QMessageBox.Ok)
+        else:
+            QMessageBox.warning(self, "Calibration Error", message, QMessageBox.Ok)
+
+    def hold_calibration_pose(self):
+        # manual recording: bring the marker down to the calibration height at the current XY
+        if self.engine.busy:
+            QMessageBox.warning(self, "Calibration Error", "A robot task is still running.", QMessageBox.Ok)
+            return
+        self.dashboard.ClearError()
+        self.dashboard.EnableRobot()
+        self.calibration_ui.robot_x = self.robot.feed_data["tool_vector_actual"][0][0]
+        self.calibration_ui.robot_y = self.robot.feed_data["tool_vector_actual"][0][1]
+        self.calibration_ui.robot_z = -150
+        self.calibration_ui.robot_r = 46
+        self.move.MovL(self.calibration_ui.robot_x, self.calibration_ui.robot_y,
+                       self.calibration_ui.robot_z, self.calibration_ui.robot_r)
 
     def get_pos_data(self):
         self.calibration_ui.robot_x = self.robot.feed_data["tool_vector_actual"][0][0]
         self.calibration_ui.robot_y = self.robot.feed_data["tool_vector_actual"][0][1]
-        self.calibration_ui.marker_x = self.cam.cX
-        self.calibration_ui.marker_y = self.cam.cY
+        # tracked marker centre when it has settled, the raw last detection otherwise
+        try:
+            position = self.cam.marker_position(timeout=0.0)
+            if position is None:
+                position = self.cam.to_reference([self.cam.cX, self.cam.cY])[0]
+        except RuntimeError as e:
+            QMessageBox.warning(self, "Calibration Error", str(e), QMessageBox.Ok)
+            return
+        self.calibration_ui.marker_x = round(float(position[0]), 1)
+        self.calibration_ui.marker_y = round(float(position[1]), 1)
 
     # ============================ Slot & Signal ============================
     def _add_toggles(self):
@@ -231,16 +410,17 @@ class MainUI(QMainWindow, Ui_MainWindow):
         self.gridLayout_robot.addWidget(self.enable_robot_toggle)
 
     def pause_task(self):
-        if self.robot_status:
-            self.dashboard.DisableRobot()
-            self.robot_status = False
+        if not self.engine.robot_status:
+            return
+        if not self.paused:
+            self.engine.enable_robot(False)
+            self.paused = True
             stop = QMessageBox.warning(self, "Stop", "The robot movement is now terminated. "
                                                      "Please click again to initialize it. ")
         else:
-            # self.dashboard.
-            self.dashboard.EnableRobot()
-            self.robot_status = True
-            self.move.MovL(275, -30, 130, 46)
+            self.engine.enable_robot(True)
+            self.paused = False
+            self.move.MovL(*self.engine.home)
 
     def _init_features(self):
         self.Button_camera.clicked.connect(self.load_stream)
@@ -249,22 +429,84 @@ class MainUI(QMainWindow, Ui_MainWindow):
         self.Button_start.clicked.connect(self.start_task)
         self.Button_export.clicked.connect(self.export_measurement_data)
         self.enable_robot_toggle.clicked.connect(self.enable_switch_robot)
-        self.timer.timeout.connect(self.show_image)
         self.Button_stop.clicked.connect(self.pause_task)
+        self.timer.timeout.connect(self.show_image)
+        self.profile_box.currentTextChanged.connect(self.switch_profile)
+        self.signal_task_error.connect(self.show_task_error)
+        self.signal_panel_result.connect(self.insert_data)
+        self.signal_calib_pair.connect(self.calibration_ui.add_pair)
+        self.signal_calib_done.connect(self.show_calibration_done)
+        self.signal_export_done.connect(self.show_export_done)
+        self.signal_task_busy.connect(self.set_task_busy)
 
     def closeEvent(self, event):
         self.calibration_ui.close()
+        self.timer.stop()
+        self.metrics_panel.timer.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        self.engine.close()
+
+
+class DetectionBridge(QtCore.QObject):
+    # emitted from detection worker threads, delivered on the gui thread
+    signal_result = QtCore.pyqtSignal(object)
+
+
+class MetricsPanel(QWidget):
+    # (metric, label, scale, unit) shown in the panel, the full set is on the /metrics endpoint
+    ROWS = [
+        ("cell_camera_fps", "Camera", 1, "fps"),
+        ("cell_detection_seconds", "Detection", 1e3, "ms"),
+        ("cell_detection_dropped_total", "Dropped frames", 1, ""),
+        ("cell_feed_rate_hz", "Feed", 1, "Hz"),
+        ("cell_feed_age_seconds", "Feed age", 1e3, "ms"),
+        ("cell_feed_invalid_total", "Invalid packets", 1, ""),
+        ("cell_sensor_rate_hz", "Laser", 1, "Hz"),
+        ("cell_cycle_seconds", "Last tour", 1, "s"),
+        ("cell_panels_total", "Panels", 1, ""),
+    ]
+
+    def __init__(self, registry: MetricsRegistry, interval=1000):
+        super().__init__()
+        self.registry = registry
+        layout = QtWidgets.QFormLayout(self)
+        self.values = {}
+        for name, label, _, _ in MetricsPanel.ROWS:
+            value = QtWidgets.QLabel("-")
+            layout.addRow(label, value)
+            self.values[name] = value
+
+        # polled on the gui thread, one collect per interval regardless of the stream rates
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(interval)
+
+    def refresh(self):
+        samples = {name: value for name, _, _, value in self.registry.collect()}
+        for name, _, scale, unit in MetricsPanel.ROWS:
+            value = samples.get(name, float("nan"))
+            text = "-" if value != value else f"{value * scale:.1f} {unit}".strip()
+            self.values[name].setText(text)
 
 
 class CalibUI(QWidget, Ui_Form):
     signal_out = QtCore.pyqtSignal()
     signal_camera = QtCore.pyqtSignal()
+    signal_calibration = QtCore.pyqtSignal()
+    signal_robot_pos = QtCore.pyqtSignal()
+    signal_auto = QtCore.pyqtSignal()
 
     def __init__(self):
         super().__init__()
         self.setupUi(self)
         self.retranslateUi(self)
 
+        # drives the robot over a grid and records every pair without clicking
+        self.Button_auto = QtWidgets.QPushButton("Auto Calibration", self)
+        if self.layout() is not None:
+            self.layout().addWidget(self.Button_auto)
+
         self._init_features()
 
         # initialize the robot and marker pose
@@ -288,24 +530,25 @@ class CalibUI(QWidget, Ui_Form):
             self.cnt_marker += 1
 
         elif robot:
-            print(ui.robot.feed_data["tool_vector_actual"])
-            ui.dashboard.ClearError()
-            ui.dashboard.EnableRobot()
-            ui.calibration_ui.robot_x = ui.robot.feed_data["tool_vector_actual"][0][0]
-            ui.calibration_ui.robot_y = ui.robot.feed_data["tool_vector_actual"][0][1]
-            ui.calibration_ui.robot_z = -150
-            ui.calibration_ui.robot_r = 46
-
-            ui.move.MovL(ui.calibration_ui.robot_x,ui.calibration_ui.robot_y,
-                         ui.calibration_ui.robot_z,ui.calibration_ui.robot_r)
-            # ui.move.MovL(275, -30, 130, 46)
-            # ui.move.MovL(275, -30, 130, 46)
-
+            self.signal_robot_pos.emit()
 
             self.model.setItem(self.cnt_robot, 2, QtGui.QStandardItem(str(round(self.robot_x, 1))))
             self.model.setItem(self.cnt_robot, 3, QtGui.QStandardItem(str(round(self.robot_y, 1))))
             self.cnt_robot += 1
 
+    def add_pair(self, index, marker_x, marker_y, robot_x, robot_y):
+        # pair recorded by the automatic routine, index 0 starts a fresh table
+        if index == 0:
+            self.model.removeRows(0, self.model.rowCount())
+            self.cnt_marker = 0
+            self.cnt_robot = 0
+        self.model.setItem(self.cnt_marker, 0, QtGui.QStandardItem(str(round(marker_x, 1))))
+        self.model.setItem(self.cnt_marker, 1, QtGui.QStandardItem(str(round(marker_y, 1))))
+        self.model.setItem(self.cnt_robot, 2, QtGui.QStandardItem(str(round(robot_x, 1))))
+        self.model.setItem(self.cnt_robot, 3, QtGui.QStandardItem(str(round(robot_y, 1))))
+        self.cnt_marker += 1
+        self.cnt_robot += 1
+
     def export_data(self):
         if self.cnt_robot != self.cnt_marker:
             QMessageBox.warning(self, "Calibration Error", "Calibration data is incomplete!", QMessageBox.Ok)
@@ -319,8 +562,9 @@ class CalibUI(QWidget, Ui_Form):
                     data.append([self.model.item(i, 0).text(), self.model.item(i, 1).text(),
                                  self.model.item(i, 2).text(), self.model.item(i, 3).text()])
                 writer.writerows(data)
-                QMessageBox.information(self, "Hand-eye vision_api",
-                                        "Data saved in vision_api/calibration_data.csv", QMessageBox.Ok)
+            QMessageBox.information(self, "Hand-eye vision_api",
+                                    "Data saved in vision_api/calibration_data.csv", QMessageBox.Ok)
+            self.signal_calibration.emit()
 
     def clear_data(self):
         indexes = self.tableView.selectionModel().selectedRows()
@@ -348,6 +592,7 @@ class CalibUI(QWidget, Ui_Form):
         self.Button_get_marker_pos.clicked.connect(lambda: self.record_pos(marker=True, robot=False))
         self.Button_clear.clicked.connect(self.clear_data)
         self.Button_export.clicked.connect(self.export_data)
+        self.Button_auto.clicked.connect(lambda: self.signal_auto.emit())
 
 
 if __name__ == "__main__":
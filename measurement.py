@@ -0,0 +1,131 @@
+import time
+import numpy as np
+from vision_api.sensor import Sensor
+from robot_api.planner import plan_probe_path
+
+
+class ProbeResult:
+    def __init__(self, index, thickness, pose, stamp, samples):
+        self.index = index  # probe point 0..8
+        self.thickness = thickness  # mm
+        self.pose = pose  # mean robot [x, y, z, R] over the paired samples
+        self.stamp = stamp  # monotonic time of the first paired sample
+        self.samples = samples  # number of laser samples used
+
+
+class PanelRun:
+    def __init__(self, robot, move, sensor: Sensor, probe_z=-166, retract_z=-150, r=46,
+                 settle=0.05, samples=20, pose_tolerance=1.0, timeout=10.0, dashboard=None):
+        self.robot = robot
+        self.move = move
+        self.sensor = sensor
+        # optional, sets continuous-path blending and the linear speed limits for run_path
+        self.dashboard = dashboard
+
+        # probe heights (mm), sensor settle time after arrival (s), samples per point
+        self.probe_z = probe_z
+        self.retract_z = retract_z
+        self.r = r
+        self.settle = settle
+        self.samples = samples
+        self.pose_tolerance = pose_tolerance
+        self.timeout = timeout
+        # a feed silent for longer than this (s) counts as lost, the MG400 sends at 125 Hz
+        self.feed_timeout = 1.0
+
+    def check_feed(self):
+        # raises ConnectionError when robot positions are no longer arriving, a move could never be confirmed
+        if not self.robot.feed_connected:
+            raise ConnectionError("Robot feed disconnected")
+        age = time.monotonic() - self.robot.feed_stamp
+        if age > self.feed_timeout:
+            raise ConnectionError(f"Robot feed silent for {age:.1f} s")
+
+    def move_wait(self, x, y, z, r):
+        self.check_feed()
+        self.move.MovL(x, y, z, r)
+        if not self.robot.wait_arrive([x, y, z, r], timeout=self.timeout):
+            self.check_feed()
+            raise TimeoutError(f"Robot did not reach [{x:.1f}, {y:.1f}, {z:.1f}, {r:.1f}] within {self.timeout} s")
+
+    def measure_point(self, index, x, y, z=None):
+        # z overrides the fixed probe height, e.g. from the depth-measured panel surface
+        z = self.probe_z if z is None else z
+        self.move_wait(x, y, z, self.r)
+        return self.sample_point(index, x, y, z)
+
+    def sample_point(self, index, x, y, z):
+        # robot already at the probe pose
+        target = np.array([x, y, z, self.r])
+
+        # only samples taken after the sensor settled, each paired with the pose at its timestamp
+        since = time.monotonic() + self.settle
+        values, stamps = self.sensor.wait_samples(self.samples, since=since, timeout=self.timeout,
+                                                  with_stamps=True)
+        poses = self.robot.poses_at(stamps)
+        still = np.all(np.abs(poses - target) <= self.pose_tolerance, axis=1)
+        if not np.any(still):
+            raise RuntimeError(f"Robot moved away from probe point {index + 1} while measuring")
+
+        thickness = Sensor.to_distance(values[still].min())
+        return ProbeResult(index, thickness, poses[still].mean(axis=0), stamps[still][0], int(still.sum()))
+
+    def run_path(self, panels_robot_pts, start, panels_probe_z=None, keep_out=(), blend=50,
+                 speed_ratio=None, acc_ratio=None):
+        # every probe point of every panel from start, in one precomputed jump-shaped path. Each leg is
+        # queued back to back so the robot blends through the lift and transfer poses and only stops on
+        # the probe. panels_probe_z optionally gives per-point probe heights, retracting by the same
+        # clearance. blend is the CP ratio (0-100), speed_ratio / acc_ratio the SpeedL / AccL limits (%)
+        # returns one list of ProbeResults per panel, in point order
+        targets = np.concatenate([np.asarray(p).reshape(-1, 2) for p in panels_robot_pts])
+        owner = np.concatenate([np.full(len(p), k) for k, p in enumerate(panels_robot_pts)])
+        point = np.concatenate([np.arange(len(p)) for p in panels_robot_pts])
+        if panels_probe_z is None:
+            probe_z = np.full(len(targets), float(self.probe_z))
+        else:
+            probe_z = np.concatenate([np.asarray(z, dtype=np.float64).ravel() for z in panels_probe_z])
+        path = plan_probe_path(targets, probe_z, start, clearance=self.retract_z - self.probe_z, keep_out=keep_out)
+
+        if self.dashboard is not None:
+            self.dashboard.CP(blend)
+            if speed_ratio is not None:
+                self.dashboard.SpeedL(speed_ratio)
+            if acc_ratio is not None:
+                self.dashboard.AccL(acc_ratio)
+
+        results = [[None] * len(p) for p in panels_robot_pts]
+        self.check_feed()
+        try:
+            for t, leg in zip(path.order, path.legs):
+                # nothing is queued behind the probe pose, so the robot comes to rest exactly there
+                for x, y, z in leg:
+                    self.move.MovL(x, y, z, self.r)
+                x, y, z = leg[-1]
+                if not self.robot.wait_arrive([x, y, z, self.r], tolerance=self.pose_tolerance,
+                                              timeout=self.timeout):
+                    self.check_feed()
+                    raise TimeoutError(f"Robot did not reach probe point {point[t] + 1} within {self.timeout} s")
+                results[owner[t]][point[t]] = self.sample_point(int(point[t]), x, y, z)
+
+            for x, y, z in path.legs[-1]:
+                self.move.MovL(x, y, z, self.r)
+            x, y, z = path.legs[-1][-1]
+            if not self.robot.wait_arrive([x, y, z, self.r], timeout=self.timeout):
+                self.check_feed()
+                raise TimeoutError(f"Robot did not return to [{x:.1f}, {y:.1f}, {z:.1f}] within {self.timeout} s")
+        finally:
+            if self.dashboard is not None:
+                self.dashboard.CP(0)
+        return results
+
+    def pulse_at(self, x, y, z, start, keep_out=(), port=1):
+        # hops from start onto [x, y, z] over the same planned path as the probes, pulses the digital
+        # output there and returns to start. Needs the dashboard
+        path = plan_probe_path([[x, y]], z, start, clearance=self.retract_z - self.probe_z, keep_out=keep_out)
+        there, back = path.legs
+        for px, py, pz in there:
+            self.move_wait(px, py, pz, self.r)
+        self.dashboard.DO(port, 1)
+        self.dashboard.DO(port, 0)
+        for px, py, pz in back:
+            self.move_wait(px, py, pz, self.r)
@@ -0,0 +1,222 @@
+import os
+import csv
+import time
+from threading import Lock
+import numpy as np
+
+POINTS = 9
+
+# one fixed-size record per measured panel, chunk files are these records back to back
+RECORD = np.dtype([
+    ("panel_id", "<u8"),
+    ("stamp", "<f8"),  # wall-clock time the panel was stored, unix seconds
+    ("calib_version", "S10"),  # CalibrationModel.version the probe points were transformed with
+    ("thickness", "<f8", (POINTS,)),  # mm, NaN for a point that was not measured
+    ("pose", "<f8", (POINTS, 4)),  # mean robot [x, y, z, R] while sampling each point
+    ("probe_stamp", "<f8", (POINTS,)),  # monotonic time of the first paired sample per point
+    ("samples", "<u2", (POINTS,)),
+])
+
+# one entry per sealed chunk, lets queries skip chunks by id or time without opening them
+INDEX = np.dtype([("chunk", "<u4"), ("first_id", "<u8"), ("count", "<u4"), ("t_min", "<f8"), ("t_max", "<f8")])
+
+INDEX_FILE = "index.bin"
+
+
+class MeasurementStore:
+    def __init__(self, path, chunk_size=1024):
+        # append-only: records are flushed as they arrive, the open chunk is sealed into the
+        # index once it holds chunk_size panels. Memory use is one chunk at most, whatever the shift length
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_size = chunk_size
+        self._lock = Lock()
+        self._record = np.zeros(1, dtype=RECORD)
+
+        self.index = self._read_index()
+        sealed = len(self.index)
+        self._chunk = sealed
+        file = self._chunk_file(sealed)
+        # records of the open chunk survive a restart, a torn trailing record is dropped
+        self._count = os.path.getsize(file) // RECORD.itemsize if os.path.exists(file) else 0
+        if self._count and os.path.getsize(file) != self._count * RECORD.itemsize:
+            with open(file, "r+b") as f:
+                f.truncate(self._count * RECORD.itemsize)
+        self._file = open(file, "ab")
+        self._next_id = self._last_id() + 1
+        self._t_min = np.inf
+        self._t_max = -np.inf
+        if self._count:
+            stamps = self._read_chunk(sealed, self._count)["stamp"]
+            self._t_min, self._t_max = float(stamps.min()), float(stamps.max())
+
+    def _chunk_file(self, chunk):
+        return os.path.join(self.path, f"chunk_{chunk:06d}.bin")
+
+    def _read_index(self):
+        file = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(file):
+            return np.zeros(0, dtype=INDEX)
+        return np.fromfile(file, dtype=INDEX)
+
+    def _read_chunk(self, chunk, count):
+        # memory-mapped, only the pages a query touches are read
+        if count == 0:
+            return np.zeros(0, dtype=RECORD)
+        return np.memmap(self._chunk_file(chunk), dtype=RECORD, mode="r", shape=(count,))
+
+    def _last_id(self):
+        if self._count:
+            return int(self._read_chunk(self._chunk, self._count)["panel_id"][-1])
+        if len(self.index):
+            last = self.index[-1]
+            return int(last["first_id"]) + int(last["count"]) - 1
+        return -1
+
+    def __len__(self):
+        return int(self.index["count"].sum()) + self._count
+
+    # ============================ Append ============================
+    def append(self, panel_results, calib_version):
+        # panel_results --> ProbeResults of one panel in point order, returns the new panel id
+        record = self._record
+        record[0] = 0
+        record["thickness"] = np.nan
+        for p in panel_results:
+            if p is None:
+                continue
+            record["thickness"][0][p.index] = p.thickness
+            record["pose"][0][p.index] = p.pose
+            record["probe_stamp"][0][p.index] = p.stamp
+            record["samples"][0][p.index] = p.samples
+        record["calib_version"] = calib_version.encode("ascii") if isinstance(calib_version, str) else calib_version
+
+        with self._lock:
+            panel_id = self._next_id
+            stamp = time.time()
+            record["panel_id"] = panel_id
+            record["stamp"] = stamp
+            self._file.write(record.tobytes())
+            self._file.flush()
+            self._next_id += 1
+            self._count += 1
+            self._t_min = min(self._t_min, stamp)
+            self._t_max = max(self._t_max, stamp)
+            if self._count >= self.chunk_size:
+                self._seal()
+        return panel_id
+
+    def _seal(self):
+        entry = np.array([(self._chunk, self._next_id - self._count, self._count, self._t_min, self._t_max)],
+                         dtype=INDEX)
+        self._file.close()
+        with open(os.path.join(self.path, INDEX_FILE), "ab") as f:
+            f.write(entry.tobytes())
+        self.index = np.concatenate([self.index, entry])
+        self._chunk += 1
+        self._count = 0
+        self._t_min = np.inf
+        self._t_max = -np.inf
+        self._file = open(self._chunk_file(self._chunk), "ab")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    # ============================ Query ============================
+    def chunks(self, since=None, until=None, first_id=None, last_id=None, calib_version=None):
+        # yields record arrays one chunk at a time, filtered to the stamp / id range and calibration
+        with self._lock:
+            # snapshot, panels appended during the query are not part of it
+            index = self.index.copy()
+            open_entry = (self._chunk, self._next_id - self._count, self._count, self._t_min, self._t_max)
+        entries = list(index)
+        if open_entry[2]:
+            entries.append(np.array([open_entry], dtype=INDEX)[0])
+
+        version = calib_version.encode("ascii") if isinstance(calib_version, str) else calib_version
+        for chunk, chunk_first, count, t_min, t_max in entries:
+            chunk_last = int(chunk_first) + int(count) - 1
+            if since is not None and t_max < since or until is not None and t_min > until:
+                continue
+            if first_id is not None and chunk_last < first_id or last_id is not None and chunk_first > last_id:
+                continue
+            records = self._read_chunk(int(chunk), int(count))
+            keep = np.ones(len(records), dtype=bool)
+            if since is not None:
+                keep &= records["stamp"] >= since
+            if until is not None:
+                keep &= records["stamp"] <= until
+            if first_id is not None:
+                keep &= records["panel_id"] >= first_id
+            if last_id is not None:
+                keep &= records["panel_id"] <= last_id
+            if version is not None:
+                keep &= records["calib_version"] == version
+            if keep.any():
+                yield np.array(records[keep])
+
+    def query(self, **kwargs):
+        # all matching records in one array, for bounded ranges, use chunks() for a whole shift
+        parts = list(self.chunks(**kwargs))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=RECORD)
+
+    def get(self, panel_id):
+        records = self.query(first_id=panel_id, last_id=panel_id)
+        return records[0] if len(records) else None
+
+    def latest(self, n=10):
+        last = self._next_id - 1
+        return self.query(first_id=max(last - n + 1, 0), last_id=last)
+
+    # ============================ Export ============================
+    def export_csv(self, filename, **kwargs):
+        # streams chunk by chunk, returns the number of panels written
+        header = ["panel_id", "time", "calib_version", "avg"]
+        header += [f"thickness_{i + 1}" for i in range(POINTS)]
+        header += [f"{axis}_{i + 1}" for i in range(POINTS) for axis in ("x", "y", "z", "r")]
+        header += [f"samples_{i + 1}" for i in range(POINTS)]
+        written = 0
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for records in self.chunks(**kwargs):
+                avg = np.nanmean(records["thickness"], axis=1) if len(records) else []
+                for record, mean in zip(records, avg):
+                    writer.writerow([int(record["panel_id"]),
+                                     time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["stamp"])),
+                                     record["calib_version"].decode("ascii"), round(float(mean), 3),
+                                     *np.round(record["thickness"], 3),
+                                     *np.round(record["pose"].ravel(), 2),
+                                     *record["samples"]])
+                written += len(records)
+        return written
+
+    def export_parquet(self, filename, **kwargs):
+        # optional, needs pyarrow. One row group per chunk so memory stays bounded here too
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        written = 0
+        try:
+            for records in self.chunks(**kwargs):
+                columns = {
+                    "panel_id": records["panel_id"],
+                    "stamp": records["stamp"],
+                    "calib_version": [v.decode("ascii") for v in records["calib_version"]],
+                }
+                for i in range(POINTS):
+                    columns[f"thickness_{i + 1}"] = records["thickness"][:, i]
+                    for k, axis in enumerate(("x", "y", "z", "r")):
+                        columns[f"{axis}_{i + 1}"] = records["pose"][:, i, k]
+                    columns[f"samples_{i + 1}"] = records["samples"][:, i]
+                table = pa.table(columns)
+                if writer is None:
+                    writer = pq.ParquetWriter(filename, table.schema)
+                writer.write_table(table)
+                written += len(records)
+        finally:
+            if writer is not None:
+                writer.close()
+        return written
@@ -0,0 +1,122 @@
+import time
+import math
+from threading import Thread, Lock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MetricsRegistry:
+    def __init__(self, labels=None):
+        # pull-based: every metric is a callable read at scrape time, so the capture, feed and
+        # sensor loops pay nothing for being observed. labels are added to every sample, e.g. the cell
+        self.labels = dict(labels or {})
+        self._metrics = {}  # name -> (type, help, fn)
+        self._lock = Lock()
+
+    def gauge(self, name, help_text, fn):
+        with self._lock:
+            self._metrics[name] = ("gauge", help_text, fn)
+
+    def counter(self, name, help_text, fn):
+        with self._lock:
+            self._metrics[name] = ("counter", help_text, fn)
+
+    def collect(self):
+        # [(name, type, help, value)], NaN for a metric whose source is not up yet
+        with self._lock:
+            metrics = list(self._metrics.items())
+        samples = []
+        for name, (kind, help_text, fn) in metrics:
+            try:
+                value = fn()
+            except (AttributeError, TypeError, IndexError, ValueError):
+                value = None
+            samples.append((name, kind, help_text, float("nan") if value is None else float(value)))
+        return samples
+
+    def to_prometheus(self):
+        # text exposition format 0.0.4
+        labels = ",".join(f'{k}="{v}"' for k, v in self.labels.items())
+        labels = "{" + labels + "}" if labels else ""
+        lines = []
+        for name, kind, help_text, value in self.collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{labels} {'NaN' if math.isnan(value) else repr(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def register_engine(registry: MetricsRegistry, engine):
+    # every source is looked up at scrape time, devices that are not open read as NaN
+    def capture():
+        return engine.cam.capture if engine.camera_status else None
+
+    def detector():
+        return engine.detector if engine.camera_status else None
+
+    def feed_age():
+        robot = engine.robot
+        if not robot.feed_connected or robot.feed_stamp == 0.0:
+            return None
+        return time.monotonic() - robot.feed_stamp
+
+    def sensor():
+        return engine._sensor
+
+    registry.gauge("cell_camera_fps", "Frames captured per second", lambda: capture().fps)
+    registry.counter("cell_camera_frames_total", "Frames captured", lambda: capture().frames)
+    registry.counter("cell_camera_errors_total", "Missed or timed out frames", lambda: capture().errors)
+    registry.gauge("cell_detection_seconds", "Duration of the last Camera.detect", lambda: detector().detect_time)
+    registry.gauge("cell_detection_latency_seconds", "Capture to detection result", lambda: detector().latency)
+    registry.counter("cell_detection_frames_total", "Frames detected", lambda: detector().processed)
+    registry.counter("cell_detection_dropped_total", "Frames skipped while detection was busy",
+                     lambda: detector().dropped)
+
+    registry.gauge("cell_robot_connected", "Feed port connected", lambda: engine.robot.feed_connected)
+    registry.gauge("cell_feed_rate_hz", "Feed packets per second", lambda: engine.robot.feed_rate)
+    registry.gauge("cell_feed_age_seconds", "Time since the last valid feed packet", feed_age)
+    registry.counter("cell_feed_packets_total", "Valid feed packets", lambda: engine.robot.feed_packets)
+    registry.counter("cell_feed_invalid_total", "Feed packets with a bad test value",
+                     lambda: engine.robot.feed_invalid)
+    registry.gauge("cell_robot_mode", "robot_mode of the last feed packet",
+                   lambda: engine.robot.feed_data["robot_mode"][0])
+
+    registry.gauge("cell_sensor_rate_hz", "Laser samples per second", lambda: sensor().rate)
+    registry.counter("cell_sensor_samples_total", "Laser samples parsed", lambda: sensor().count)
+    registry.counter("cell_sensor_parse_errors_total", "Unparseable laser lines", lambda: sensor().parse_errors)
+
+    registry.gauge("cell_cycle_seconds", "Duration of the last completed tour", lambda: engine.cycle_time)
+    registry.counter("cell_cycle_seconds_total", "Time spent in completed tours", lambda: engine.cycle_total)
+    registry.counter("cell_cycles_total", "Completed tours", lambda: engine.cycles)
+    registry.counter("cell_cycles_failed_total", "Tours that raised", lambda: engine.failed_cycles)
+    registry.counter("cell_panels_total", "Panels measured", lambda: engine.panel_count)
+
+
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, host="127.0.0.1", port=9108):
+        # serves GET /metrics on localhost from a daemon thread, raises OSError if the port is taken
+        registry_ = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry_.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
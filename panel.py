@@ -0,0 +1,108 @@
+import numpy as np
+import cv2
+
+# probe grid in panel coordinates, in visit order 0..8: centre first, then the ring
+# starting on the +x side. offsets are 2/7 of the panel side along each axis
+PROBE_GRID = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [-1, 1],
+                       [-1, 0], [-1, -1], [0, -1], [1, -1]], dtype=np.float64) * (2.0 / 7.0)
+
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.01)
+
+
+class PanelModel:
+    def __init__(self, center, axes, corners, confidence, area):
+        self.center = center  # (2,) pixel centre
+        self.axes = axes  # (2, 2) rows are the full-length side vectors u (~image x) and v (~image y)
+        self.corners = corners  # (4, 2) sub-pixel corners
+        self.confidence = confidence  # 0..1, how rectangular and well-formed the outline is
+        self.area = area  # contour area in pixels
+
+    @property
+    def angle(self):
+        # rotation of the panel x axis from the image x axis, degrees
+        return float(np.degrees(np.arctan2(self.axes[0][1], self.axes[0][0])))
+
+    @property
+    def size(self):
+        return np.linalg.norm(self.axes, axis=1)
+
+    def score(self, aspect=None):
+        # 0..1, the outline confidence times how close the side ratio is to the expected panel's
+        # aspect --> expected long / short side ratio, None accepts any
+        if aspect is None:
+            return self.confidence
+        long_side, short_side = max(self.size), max(min(self.size), 1e-9)
+        ratio = long_side / short_side
+        return self.confidence * min(ratio, aspect) / max(ratio, aspect)
+
+    def probe_points(self, grid=PROBE_GRID):
+        # (9, 2) probe points mapped through the panel's rotated frame
+        return self.center + grid @ self.axes
+
+
+def contour_areas(contours):
+    # shoelace area of every contour at once over the concatenated point list
+    if len(contours) == 0:
+        return np.zeros(0)
+    lengths = np.fromiter((len(c) for c in contours), dtype=np.int64, count=len(contours))
+    pts = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    nxt = np.arange(len(pts)) + 1
+    nxt[starts + lengths - 1] = starts
+    cross = pts[:, 0] * pts[nxt, 1] - pts[nxt, 0] * pts[:, 1]
+    return np.abs(np.add.reduceat(cross, starts)) / 2.0
+
+
+def _panel_from_contour(contour, area, gray, offset):
+    rect = cv2.minAreaRect(contour)
+    rect_area = rect[1][0] * rect[1][1]
+    if rect_area <= 0:
+        return None
+    box = cv2.boxPoints(rect)
+
+    # refine the box corners on the grey image, kept a window away from the border
+    h, w = gray.shape[:2]
+    win = 5
+    box[:, 0] = np.clip(box[:, 0], win, w - 1 - win)
+    box[:, 1] = np.clip(box[:, 1], win, h - 1 - win)
+    corners = cv2.cornerSubPix(gray, box.reshape(-1, 1, 2).astype(np.float32), (win, win), (-1, -1),
+                               SUBPIX_CRITERIA).reshape(4, 2).astype(np.float64)
+
+    # average opposite sides, then name the side closest to image x as u
+    side_a = ((corners[1] - corners[0]) + (corners[2] - corners[3])) / 2.0
+    side_b = ((corners[3] - corners[0]) + (corners[2] - corners[1])) / 2.0
+    u, v = (side_a, side_b) if abs(side_a[0]) >= abs(side_b[0]) else (side_b, side_a)
+    u = u if u[0] >= 0 else -u
+    v = v if v[1] >= 0 else -v
+
+    # confidence: how much of the bounding rectangle the contour fills, and how parallel the sides are
+    fill = min(area / rect_area, 1.0)
+    lengths = np.linalg.norm(corners - np.roll(corners, -1, axis=0), axis=1)
+    parallel = min(lengths[0], lengths[2]) / max(lengths[0], lengths[2], 1e-9) * \
+        min(lengths[1], lengths[3]) / max(lengths[1], lengths[3], 1e-9)
+    corners += offset
+    return PanelModel(corners.mean(axis=0), np.array([u, v]), corners, fill * parallel, area)
+
+
+def find_panels(color_image, min_area=800, max_panels=None, offset=(0, 0), min_score=0.0, aspect=None):
+    # returns PanelModels ordered best first, the best is the most rectangular large outline
+    # outlines scoring below min_score against the expected aspect ratio are dropped as clutter
+    # offset is added to every position, for images cropped out of a larger frame
+    gray = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    binary = cv2.Canny(blur, 30, 120)
+    # turn grey image into binary image(edge)
+    # tuning parameter cv2.Canny(image,low_threshold',high_threshold)
+    # The high_threshold shall be set as 3 times the low_threshold following Canny's recommendation .
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    areas = contour_areas(contours)
+    # filter small area
+    candidates = np.flatnonzero(areas >= min_area)
+    panels = []
+    for i in candidates:
+        panel = _panel_from_contour(contours[i], areas[i], gray, np.asarray(offset, dtype=np.float64))
+        if panel is not None and panel.score(aspect) >= min_score:
+            panels.append(panel)
+    panels.sort(key=lambda p: p.score(aspect) * p.area, reverse=True)
+    return panels[:max_panels] if max_panels else panels
@@ -0,0 +1,161 @@
+import numpy as np
+
+
+def transit_nodes(targets, start, retract_z):
+    # node 0 is the start pose, the rest are the probe targets lifted to the retract height
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    nodes = np.empty((len(targets) + 1, 3))
+    nodes[0] = start[:3]
+    nodes[1:, :2] = targets
+    nodes[1:, 2] = retract_z
+    return nodes
+
+
+def distance_matrix(nodes):
+    diff = nodes[:, None, :] - nodes[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def nearest_neighbour(d):
+    # greedy closed tour from node 0
+    n = len(d)
+    tour = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, d[tour[-1]])
+        nxt = int(np.argmin(row))
+        tour.append(nxt)
+        visited[nxt] = True
+    return np.array(tour)
+
+
+def two_opt(d, tour):
+    # reverse tour[i:j + 1] while that shortens the closed tour, node 0 stays first
+    tour = tour.copy()
+    n = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = tour[i - 1], tour[i]
+            c = tour[i + 1:]
+            e = np.append(tour[i + 2:], tour[0])
+            # gain of replacing edges (a, b) and (c, e) by (a, c) and (b, e) for every j at once
+            delta = d[a, c] + d[b, e] - d[a, b] - d[c, e]
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-9:
+                tour[i:i + j + 2] = tour[i:i + j + 2][::-1]
+                improved = True
+    return tour
+
+
+def tour_length(d, tour):
+    return float(d[tour, np.roll(tour, -1)].sum())
+
+
+def plan_tour(targets, start, retract_z):
+    # order the probe targets (N, 2) into a short closed tour starting and ending at start [x, y, z]
+    # travel between probes happens at retract_z, so costs are 3D distances between lifted targets
+    nodes = transit_nodes(targets, start, retract_z)
+    d = distance_matrix(nodes)
+    tour = two_opt(d, nearest_neighbour(d))
+    return tour[1:] - 1, tour_length(d, tour)
+
+
+# ============================ Probe path ============================
+def segment_time(length, speed, accel):
+    # stop-to-stop trapezoidal move, triangular when the segment is too short to reach speed
+    length = np.asarray(length, dtype=np.float64)
+    cruise = length >= speed * speed / accel
+    return np.where(cruise, length / speed + speed / accel, 2 * np.sqrt(length / accel))
+
+
+def crosses_zone(p, q, zone):
+    # does the XY segment p -> q pass over the footprint of zone (xmin, ymin, zmin, xmax, ymax, zmax)
+    # Liang-Barsky clip of the segment against the rectangle
+    (x0, y0), (x1, y1) = p[:2], q[:2]
+    xmin, ymin, _, xmax, ymax, _ = zone
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0.0, 1.0
+    for den, num in ((-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)):
+        if den == 0:
+            if num < 0:
+                return False
+            continue
+        t = num / den
+        if den < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return False
+    return True
+
+
+def hop_height(p, q, floor, keep_out=(), margin=2.0, max_z=None):
+    # lowest travel height between two poses: at least floor, lifted over every keep-out zone
+    # the straight XY path passes over
+    z = floor
+    for zone in keep_out:
+        if crosses_zone(p, q, zone):
+            z = max(z, zone[5] + margin)
+    if max_z is not None and z > max_z:
+        raise ValueError(f"No path from [{p[0]:.1f}, {p[1]:.1f}] to [{q[0]:.1f}, {q[1]:.1f}] "
+                         f"clears the keep-out zones below Z {max_z:.1f}")
+    return z
+
+
+class ProbePath:
+    def __init__(self, order, targets, legs, leg_times, stop_go_time):
+        self.order = order  # visiting order, indices into the flattened probe targets
+        self.targets = targets  # (N, 3) probe poses [x, y, z] in visiting order
+        # legs[k] --> poses queued back to back to reach targets[k] (the last one is the target itself),
+        # the final leg returns to the start pose
+        self.legs = legs
+        self.leg_times = leg_times  # estimated blended travel time per leg (s), dwell excluded
+        self.stop_go_time = stop_go_time  # same legs with a full stop at every pose (s)
+
+    @property
+    def travel_time(self):
+        return float(np.sum(self.leg_times))
+
+
+def plan_probe_path(targets, probe_z, start, clearance=16.0, keep_out=(), margin=2.0, max_z=None,
+                    speed=300.0, accel=1500.0):
+    # targets --> (N, 2) probe XY, probe_z --> scalar or (N,) probe heights, start --> [x, y, z]
+    # each leg is jump-shaped: lift above the current probe, cross at the lowest safe height, drop onto
+    # the next probe. The intermediate poses are meant to be blended, only the probe pose is a stop.
+    # speed / accel (mm/s, mm/s^2) are the linear limits the robot runs at, used for the time estimates
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    probe_z = np.broadcast_to(np.asarray(probe_z, dtype=np.float64), (len(targets),))
+    start = np.asarray(start[:3], dtype=np.float64)
+    order, _ = plan_tour(targets, start, probe_z.max() + clearance)
+    poses = np.column_stack([targets[order], probe_z[order]])
+
+    legs = []
+    previous = start
+    for k, pose in enumerate(list(poses) + [start]):
+        # clearance is kept above the probe poses, the start pose is taken as already safe
+        ends = [poses[i][2] for i in (k - 1, k) if 0 <= i < len(poses)]
+        z = hop_height(previous, pose, max(ends) + clearance, keep_out, margin, max_z)
+        leg = []
+        if previous[2] < z:
+            leg.append(np.array([previous[0], previous[1], z]))
+        if pose[2] < z:
+            leg.append(np.array([pose[0], pose[1], z]))
+        leg.append(pose)
+        legs.append(leg)
+        previous = pose
+
+    leg_times = []
+    stop_go_time = 0.0
+    previous = start
+    for leg in legs:
+        path = np.vstack([previous] + leg)
+        lengths = np.linalg.norm(np.diff(path, axis=0), axis=1)
+        # blending keeps the speed through the corners, so a leg costs about one profile over its length
+        leg_times.append(float(segment_time(lengths.sum(), speed, accel)))
+        stop_go_time += float(segment_time(lengths, speed, accel).sum())
+        previous = leg[-1]
+    return ProbePath(order, poses, legs, np.array(leg_times), stop_go_time)
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import numpy as np
+from threading import Thread
+from serial import SerialException
+from robot_api.dobot_api import MyType
+from vision_api.camera import Camera
+from vision_api.sensor import Sensor
+
+# on-disk layout of a recording directory
+META_FILE = "meta.json"
+FRAMES_FILE = "frames.bin"  # raw frames back to back, memory-mapped on replay
+FRAME_INDEX_FILE = "frames.idx"  # float64 monotonic stamp per frame
+FEED_FILE = "feed.bin"  # (stamp, 1440-byte packet) records
+SENSOR_FILE = "sensor.bin"  # (stamp, length, bytes) records of raw serial chunks
+
+FEED_RECORD = np.dtype([("stamp", "<f8"), ("packet", "u1", (MyType.itemsize,))])
+SENSOR_HEADER = np.dtype([("stamp", "<f8"), ("length", "<u4")])
+
+
+class Recorder:
+    def __init__(self, path):
+        # append-only log of every stream, each file is written by one thread only
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = {"frame_shape": None, "frame_dtype": "uint8", "created": time.time()}
+        # meta.json is rewritten every meta_every frames, a recording cut short still replays
+        self.meta_every = 100
+        self.poll = 0.002  # seconds between checks for a new frame
+        self._frames = None
+        self._frame_index = None
+        self._feed = open(os.path.join(path, FEED_FILE), "ab")
+        self._sensor = open(os.path.join(path, SENSOR_FILE), "ab")
+        self._feed_record = np.zeros(1, dtype=FEED_RECORD)
+        self._camera_thread = None
+        self._running = False
+
+        self.frames = 0
+        self.packets = 0
+        self.chunks = 0
+        self._write_meta()
+
+    def _write_meta(self):
+        # written aside and renamed, a reader never sees half a file
+        self.meta["frames"] = self.frames
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+    def record_camera(self, ring):
+        # recording is one more ring consumer, it keeps up with the disk and drops the rest
+        self.meta["frame_shape"] = list(ring.shape)
+        self.meta["frame_dtype"] = ring.dtype.name
+        self._write_meta()
+        self._frames = open(os.path.join(self.path, FRAMES_FILE), "ab")
+        self._frame_index = open(os.path.join(self.path, FRAME_INDEX_FILE), "ab")
+        self._running = True
+        self._camera_thread = Thread(target=self._camera_loop, args=(ring.reader(),), daemon=True)
+        self._camera_thread.start()
+
+    def _camera_loop(self, reader):
+        # polls the ring sequence number, ring.new_frame belongs to the detection thread and
+        # clearing it here would make it miss frames
+        ring = reader.ring
+        # the disk write is slow enough for the producer to lap the slot, so the frame is copied out
+        # under the reader's sequence check first and written from this buffer
+        buffer = np.empty(ring.shape, dtype=ring.dtype)
+        while self._running:
+            if ring.seq == reader.last_seq:
+                time.sleep(self.poll)
+                continue
+            latest = reader.latest(out=buffer)
+            if latest is None:
+                continue
+            frame, seq, stamp = latest
+            self.frame(stamp, frame)
+            if self.frames % self.meta_every == 0:
+                self._frames.flush()
+                self._frame_index.flush()
+                self._write_meta()
+
+    def frame(self, stamp, image):
+        self._frames.write(np.ascontiguousarray(image).data)
+        self._frame_index.write(np.float64(stamp).tobytes())
+        self.frames += 1
+
+    def packet(self, stamp, data):
+        record = self._feed_record
+        record["stamp"] = stamp
+        record["packet"][0] = np.frombuffer(data, dtype=np.uint8)
+        self._feed.write(record.data)
+        self.packets += 1
+
+    def sensor(self, stamp, chunk):
+        header = np.array([(stamp, len(chunk))], dtype=SENSOR_HEADER)
+        self._sensor.write(header.data)
+        self._sensor.write(chunk)
+        self.chunks += 1
+
+    def close(self):
+        self._running = False
+        if self._camera_thread is not None:
+            self._camera_thread.join(1.0)
+        for f in (self._frames, self._frame_index, self._feed, self._sensor):
+            if f is not None:
+                f.close()
+        self._write_meta()
+
+
+class ReplayLog:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        # frames stay on disk, memory-mapped and paged in on demand
+        self.frame_stamps = self._load(FRAME_INDEX_FILE, np.float64)
+        shape = self.meta["frame_shape"]
+        if shape and len(self.frame_stamps):
+            # a recording cut short may hold a torn last frame, only whole frames with a stamp are kept
+            file = os.path.join(path, FRAMES_FILE)
+            frame_bytes = int(np.prod(shape)) * np.dtype(self.meta["frame_dtype"]).itemsize
+            count = min(len(self.frame_stamps), os.path.getsize(file) // frame_bytes)
+            self.frame_stamps = self.frame_stamps[:count]
+            self.frames = np.memmap(file, dtype=self.meta["frame_dtype"], mode="r", shape=(count, *shape))
+        else:
+            self.frames = np.zeros((0, 1, 1, 3), dtype=np.uint8)
+
+        self.feed = self._load(FEED_FILE, FEED_RECORD)
+
+        # sensor chunks are variable length, index them once
+        self.sensor_stamps = []
+        self.sensor_chunks = []
+        with open(os.path.join(path, SENSOR_FILE), "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + SENSOR_HEADER.itemsize <= len(data):
+            header = np.frombuffer(data, dtype=SENSOR_HEADER, count=1, offset=pos)[0]
+            pos += SENSOR_HEADER.itemsize
+            self.sensor_stamps.append(float(header["stamp"]))
+            self.sensor_chunks.append(data[pos:pos + int(header["length"])])
+            pos += int(header["length"])
+
+        # earliest stamp of any stream, replay time zero
+        firsts = [s[0] for s in (self.frame_stamps, self.feed["stamp"], self.sensor_stamps) if len(s)]
+        self.start = min(firsts) if firsts else 0.0
+
+    def _load(self, name, dtype):
+        file = os.path.join(self.path, name)
+        if not os.path.exists(file) or os.path.getsize(file) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.fromfile(file, dtype=dtype)
+
+
+class ReplayClock:
+    def __init__(self, log: ReplayLog, speed=1.0):
+        # speed 1.0 is real time, 0 replays as fast as possible
+        self.log_start = log.start
+        self.speed = speed
+        self.wall_start = time.monotonic()
+
+    def wait_until(self, stamp):
+        if self.speed <= 0:
+            return
+        delay = self.wall_start + (stamp - self.log_start) / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ReplayCamera(Camera):
+    def __init__(self, log: ReplayLog, clock: ReplayClock):
+        super().__init__()
+        self.log = log
+        self.clock = clock
+        self.height, self.width = log.frames.shape[1:3]
+        self.depth_enabled = False
+        self._next = 0
+
+    def enable_camera(self):
+        self._next = 0
+        self.start_capture()
+
+    def disable_camera(self):
+        self.stop_capture()
+
+    def list_profiles(self):
+        return [(self.width, self.height, self.fps)]
+
+    def _grab(self, out):
+        if self._next >= len(self.log.frames):
+            return None
+        self.clock.wait_until(self.log.frame_stamps[self._next])
+        np.copyto(out, self.log.frames[self._next])
+        self._next += 1
+        return True
+
+
+class ReplayFeed:
+    # stands in for the DobotApi feed connection handed to RobotExec.get_feed
+    def __init__(self, log: ReplayLog, clock: ReplayClock):
+        self.socket_dobot = self
+        self.log = log
+        self.clock = clock
+        self._next = 0
+        self._pos = 0
+
+    def recv_into(self, buffer, nbytes=0):
+        # serves the recorded packets at their recorded times, 0 bytes (peer closed) at the end
+        if self._next >= len(self.log.feed):
+            return 0
+        record = self.log.feed[self._next]
+        if self._pos == 0:
+            self.clock.wait_until(record["stamp"])
+        packet = record["packet"]
+        n = min(nbytes or len(buffer), len(packet) - self._pos)
+        buffer[:n] = packet[self._pos:self._pos + n].tobytes()
+        self._pos += n
+        if self._pos == len(packet):
+            self._next += 1
+            self._pos = 0
+        return n
+
+    def close(self):
+        self._next = len(self.log.feed)
+
+
+class ReplaySensor(Sensor):
+    def __init__(self, log: ReplayLog, clock: ReplayClock):
+        # a Serial with no port is never opened
+        super().__init__(None)
+        self.log = log
+        self.clock = clock
+        self._next = 0
+
+    def _read_chunk(self):
+        if self._next >= len(self.log.sensor_chunks):
+            raise SerialException("end of recording")
+        self.clock.wait_until(self.log.sensor_stamps[self._next])
+        chunk = self.log.sensor_chunks[self._next]
+        self._next += 1
+        return chunk
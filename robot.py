@@ -1,19 +1,49 @@
+import time
 import numpy as np
 from time import sleep
-from threading import Thread
+from threading import Thread, Condition
 from robot_api.dobot_api import MyType, DobotApi, DobotApiMove, DobotApiDashboard
 
+# marker every valid feed packet carries in test_value
+FEED_TEST_VALUE = 0x0123456789ABCDEF
+
+# robot_mode values reported on the feed port
+ROBOT_MODE_DISABLED = 4
+ROBOT_MODE_ENABLE = 5
+ROBOT_MODE_RUNNING = 7
+ROBOT_MODE_ERROR = 9
+
 
 class RobotExec:
-    def __init__(self):
+    def __init__(self, ip="192.168.1.6"):
         # TCP/IP protocol settings
-        self.ip = "192.168.1.6"
+        self.ip = ip
         self.dashboard_port = 29999
         self.move_port = 30003
         self.feed_port = 30004
 
         self.feed_data = None
 
+        # feed port statistics
+        self.feed_stamp = 0.0  # monotonic time the current feed_data arrived
+        self.feed_connected = False
+        self.feed_packets = 0
+        self.feed_invalid = 0
+        self.feed_rate = 0.0  # packets per second, 125 Hz on a healthy link
+        self._feed_running = False
+
+        # optional replay.Recorder, gets every valid feed packet
+        self.recorder = None
+
+        # notified by the feed thread on every new packet and on disconnect
+        self.feed_cond = Condition()
+
+        # recent [x, y, z, R] poses with their arrival time, for pairing with other sensors
+        self.pose_size = 1024
+        self.pose_history = np.zeros((self.pose_size, 4))
+        self.pose_stamps = np.zeros(self.pose_size)
+        self.pose_count = 0
+
     def connect_robot(self):
         dashboard = DobotApiDashboard(self.ip, self.dashboard_port)
         move = DobotApiMove(self.ip, self.move_port)
@@ -21,38 +51,119 @@ class RobotExec:
         return dashboard, move, feed
 
     def get_feed(self, feed: DobotApi):
-        hasRead = 0
-        while True:
-            data = bytes()
-            while hasRead < 1440:
-                temp = feed.socket_dobot.recv(1440 - hasRead)
-                if len(temp) > 0:
-                    hasRead += len(temp)
-                    data += temp
-            hasRead = 0
-
-            a = np.frombuffer(data, dtype=MyType)
-            if hex((a['test_value'][0])) == '0x123456789abcdef':
+        # two preallocated records, the socket fills the back one in place
+        # and feed_data is swapped to it once the packet is complete and valid.
+        # readers should copy what they need, a published record is reused two packets later
+        size = MyType.itemsize
+        records = [np.zeros(1, dtype=MyType), np.zeros(1, dtype=MyType)]
+        views = [memoryview(r.view(np.uint8)) for r in records]
+        back = 0
+
+        sock = feed.socket_dobot
+        self._feed_running = True
+        self.feed_connected = True
+        t_rate = time.monotonic()
+        n_rate = 0
+        try:
+            while self._feed_running:
+                view = views[back]
+                has_read = 0
+                while has_read < size:
+                    n = sock.recv_into(view[has_read:], size - has_read)
+                    if n == 0:
+                        # peer closed the connection
+                        return
+                    has_read += n
+
+                record = records[back]
+                if record["test_value"][0] != FEED_TEST_VALUE:
+                    self.feed_invalid += 1
+                    continue
+
                 # Refresh Properties
-                self.feed_data = a
-                # print(a["tool_vector_actual"][0])
+                self.feed_data = record
+                self.feed_stamp = time.monotonic()
+                self.feed_packets += 1
+                back ^= 1
+                if self.recorder is not None:
+                    self.recorder.packet(self.feed_stamp, view)
+
+                slot = self.pose_count % self.pose_size
+                self.pose_history[slot] = record["tool_vector_actual"][0][:4]
+                self.pose_stamps[slot] = self.feed_stamp
+                self.pose_count += 1
+                with self.feed_cond:
+                    self.feed_cond.notify_all()
+
+                n_rate += 1
+                if self.feed_stamp - t_rate >= 1.0:
+                    self.feed_rate = n_rate / (self.feed_stamp - t_rate)
+                    t_rate = self.feed_stamp
+                    n_rate = 0
+        except OSError:
+            # socket closed while blocked in recv_into
+            pass
+        finally:
+            self.feed_connected = False
+            self.feed_rate = 0.0
+            with self.feed_cond:
+                self.feed_cond.notify_all()
+
+    def stop_feed(self):
+        self._feed_running = False
 
-            # sleep(0.001)
+    def poses_at(self, stamps):
+        # pose nearest in time to each monotonic stamp, (N,) -> (N, 4)
+        count = self.pose_count
+        n = min(count, self.pose_size)
+        if n == 0:
+            raise RuntimeError("No robot feed data received yet")
+        idx = np.arange(count - n, count) % self.pose_size
+        t = self.pose_stamps[idx]
+        stamps = np.atleast_1d(np.asarray(stamps, dtype=np.float64))
+        j = np.searchsorted(t, stamps)
+        lo = np.clip(j - 1, 0, n - 1)
+        hi = np.clip(j, 0, n - 1)
+        nearest = np.where(np.abs(t[lo] - stamps) <= np.abs(t[hi] - stamps), lo, hi)
+        return self.pose_history[idx[nearest]]
+
+    def wait_feed(self, check, timeout=None):
+        # block until check(feed_data) holds for a fresh packet
+        # returns False on timeout or when the feed disconnects
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.feed_cond:
+            while True:
+                if self.feed_data is not None and check(self.feed_data):
+                    return True
+                if not self.feed_connected:
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.feed_cond.wait(remaining)
 
     # point_list --> [x, y, z, R] (mm, mm, mm, degrees)
-    def wait_arrive(self, point_list: list):
-        while True:
-            is_arrive = True
+    def wait_arrive(self, point_list: list, tolerance=1.0, timeout=None):
+        target = np.asarray(point_list[:4], dtype=np.float64)
+
+        def arrived(data):
+            return np.all(np.abs(data["tool_vector_actual"][0][:4] - target) <= tolerance)
+
+        return self.wait_feed(arrived, timeout)
 
-            if self.feed_data is not None:
-                for index in range(4):
-                    if abs(self.feed_data["tool_vector_actual"][0][index] - point_list[index]) > 1:
-                        is_arrive = False
+    def wait_idle(self, timeout=None, settle=3):
+        # the motion queue is empty once the robot reports enabled-and-idle
+        # for settle consecutive packets, which skips the gap before a queued move starts
+        state = {"packet": -1, "count": 0}
 
-                if is_arrive:
-                    return
+        def idle(data):
+            if self.feed_packets == state["packet"]:
+                return False
+            state["packet"] = self.feed_packets
+            state["count"] = state["count"] + 1 if data["robot_mode"][0] == ROBOT_MODE_ENABLE else 0
+            return state["count"] >= settle
 
-            # sleep(0.001)
+        return self.wait_feed(idle, timeout)
 
 
 if __name__ == "__main__":
@@ -70,7 +181,7 @@ if __name__ == "__main__":
     point_c = [400, -45, -70, 4]
     point_d = [400, -45, -160, 4]
     # move_r.MovL(point_a[0], point_a[1], point_a[2], point_a[3])
-    # # robot.wait_arrive(point_a)
+    # # robot.wait_arrive(point_a, timeout=10)
     # move_r.MovL(point_b[0], point_b[1], point_b[2], point_b[3])
     # # robot.wait_arrive(point_b)
     # sleep(1)
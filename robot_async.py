@@ -0,0 +1,248 @@
+import asyncio
+import time
+from collections import deque
+import numpy as np
+from robot_api.dobot_api import MyType
+from robot_api.robot import FEED_TEST_VALUE, ROBOT_MODE_ENABLE
+
+
+class RobotCommandError(Exception):
+    def __init__(self, error_id, reply):
+        super().__init__(f"ErrorID {error_id}: {reply}")
+        self.error_id = error_id
+        self.reply = reply
+
+
+class _Channel:
+    # one command port, replies come back in order so they are matched to a FIFO of futures
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = deque()
+        self.task = asyncio.ensure_future(self._read_replies())
+
+    async def _read_replies(self):
+        try:
+            while True:
+                reply = await self.reader.readuntil(b";")
+                if self.pending:
+                    future = self.pending.popleft()
+                    if not future.done():
+                        future.set_result(reply.decode("utf-8").strip())
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._fail(ConnectionError(f"robot closed the connection: {e}"))
+        except asyncio.CancelledError:
+            self._fail(ConnectionError("channel closed"))
+            raise
+
+    def _fail(self, error):
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    def send(self, command):
+        # queue the command and return a future for its reply, no round-trip wait here
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        self.writer.write(command.encode("utf-8"))
+        return future
+
+    async def close(self):
+        self.task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class AsyncRobotClient:
+    def __init__(self, ip="192.168.1.6", dashboard_port=29999, move_port=30003, feed_port=30004, timeout=5.0):
+        # TCP/IP protocol settings
+        self.ip = ip
+        self.dashboard_port = dashboard_port
+        self.move_port = move_port
+        self.feed_port = feed_port
+        self.timeout = timeout
+
+        self._dashboard = None
+        self._move = None
+        self._feed_reader = None
+        self._feed_writer = None
+
+        # kept current by a background task draining the feed port, so nothing piles up unread
+        self.feed_data = None
+        self.feed_stamp = 0.0
+        self.feed_connected = False
+        self.feed_packets = 0
+        self.feed_invalid = 0
+        self._feed_task = None
+        self._feed_event = None  # set and replaced on every packet
+
+    async def connect(self):
+        async def open_port(port):
+            return await asyncio.wait_for(asyncio.open_connection(self.ip, port), self.timeout)
+
+        dashboard, move, feed = await asyncio.gather(open_port(self.dashboard_port),
+                                                     open_port(self.move_port),
+                                                     open_port(self.feed_port))
+        self._dashboard = _Channel(*dashboard)
+        self._move = _Channel(*move)
+        self._feed_reader, self._feed_writer = feed
+        self._feed_event = asyncio.Event()
+        self.feed_connected = True
+        self._feed_task = asyncio.ensure_future(self._read_feed())
+
+    async def close(self):
+        for channel in (self._dashboard, self._move):
+            if channel is not None:
+                await channel.close()
+        if self._feed_task is not None:
+            self._feed_task.cancel()
+            self._feed_task = None
+        if self._feed_writer is not None:
+            self._feed_writer.close()
+        self._dashboard = self._move = None
+        self._feed_reader = self._feed_writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @staticmethod
+    def _parse(reply):
+        # "ErrorID,{values},Command(...);"
+        error_id = int(reply.split(",", 1)[0])
+        if error_id != 0:
+            raise RobotCommandError(error_id, reply)
+        start = reply.find("{")
+        end = reply.find("}", start)
+        return reply[start + 1:end] if start >= 0 and end >= 0 else ""
+
+    async def _request(self, channel, command, timeout):
+        future = channel.send(command)
+        await channel.writer.drain()
+        reply = await asyncio.wait_for(future, timeout or self.timeout)
+        return self._parse(reply)
+
+    async def dashboard(self, command, timeout=None):
+        return await self._request(self._dashboard, command, timeout)
+
+    async def move(self, command, timeout=None):
+        return await self._request(self._move, command, timeout)
+
+    async def move_many(self, commands, timeout=None):
+        # pipeline: write every command before waiting for the first reply
+        futures = [self._move.send(command) for command in commands]
+        await self._move.writer.drain()
+        replies = await asyncio.wait_for(asyncio.gather(*futures), timeout or self.timeout * len(futures))
+        return [self._parse(reply) for reply in replies]
+
+    # ============================ Commands ============================
+    async def EnableRobot(self):
+        return await self.dashboard("EnableRobot()")
+
+    async def DisableRobot(self):
+        return await self.dashboard("DisableRobot()")
+
+    async def ClearError(self):
+        return await self.dashboard("ClearError()")
+
+    async def DO(self, index, status):
+        return await self.dashboard(f"DO({index:d},{status:d})")
+
+    async def MovL(self, x, y, z, r):
+        return await self.move(f"MovL({x:f},{y:f},{z:f},{r:f})")
+
+    async def MovL_many(self, points):
+        # points --> iterable of [x, y, z, R]
+        return await self.move_many([f"MovL({x:f},{y:f},{z:f},{r:f})" for x, y, z, r in points])
+
+    # ============================ Feed ============================
+    async def _read_feed(self):
+        # runs for the whole connection, validated packets update feed_data and wake the waiters
+        size = MyType.itemsize
+        try:
+            while True:
+                data = await self._feed_reader.readexactly(size)
+                record = np.frombuffer(data, dtype=MyType)
+                if record["test_value"][0] != FEED_TEST_VALUE:
+                    self.feed_invalid += 1
+                    continue
+                self.feed_data = record
+                self.feed_stamp = time.monotonic()
+                self.feed_packets += 1
+                self._notify_feed()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.feed_connected = False
+            self._notify_feed()
+
+    def _notify_feed(self):
+        event, self._feed_event = self._feed_event, asyncio.Event()
+        event.set()
+
+    async def feed(self):
+        # async iterator over the packets that arrive from now on, newest only when the consumer
+        # is slower than the feed. Ends when the feed disconnects
+        seen = self.feed_packets
+        while self.feed_connected:
+            if self.feed_packets == seen:
+                await self._feed_event.wait()
+                continue
+            seen = self.feed_packets
+            yield self.feed_data
+
+    async def wait_feed(self, check, timeout=None):
+        # like RobotExec.wait_feed: True once check(record) holds for a packet received after the call,
+        # False on timeout or when the feed disconnects
+        async def wait():
+            async for record in self.feed():
+                if check(record):
+                    return True
+            return False
+
+        try:
+            return await asyncio.wait_for(wait(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait_arrive(self, point_list, tolerance=1.0, timeout=None):
+        # like RobotExec.wait_arrive: True on arrival, False on timeout or when the feed ends.
+        # A queued tour that ends where it started is at its target before it moves, use wait_idle
+        target = np.asarray(point_list[:4], dtype=np.float64)
+
+        def arrived(record):
+            return np.all(np.abs(record["tool_vector_actual"][0][:4] - target) <= tolerance)
+
+        return await self.wait_feed(arrived, timeout)
+
+    async def wait_idle(self, timeout=None, settle=3):
+        # like RobotExec.wait_idle: the motion queue is empty once the robot reports enabled-and-idle
+        # for settle consecutive packets, which skips the gap before a queued move starts
+        count = 0
+
+        def idle(record):
+            nonlocal count
+            count = count + 1 if record["robot_mode"][0] == ROBOT_MODE_ENABLE else 0
+            return count >= settle
+
+        return await self.wait_feed(idle, timeout)
+
+
+async def _demo():
+    async with AsyncRobotClient() as robot:
+        await robot.EnableRobot()
+        points = [[338, -45, -70, 4], [338, -45, -163, 4], [400, -45, -70, 4], [400, -45, -160, 4]]
+        await robot.MovL_many(points)
+        await robot.wait_idle(timeout=20)
+        await robot.DisableRobot()
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
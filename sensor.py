@@ -1,8 +1,11 @@
-from serial import Serial
+import time
+import numpy as np
+from threading import Thread, Condition
+from serial import Serial, SerialException
 
 
 class Sensor(Serial):
-    def __init__(self, port, baudrate=9600, timeout=0.1, bytesize=8, parity='N', stopbits=1):
+    def __init__(self, port, baudrate=9600, timeout=0.1, bytesize=8, parity='N', stopbits=1, size=4096):
         super().__init__(port)
         self.port = port
         self.baudrate = baudrate
@@ -11,23 +14,141 @@ class Sensor(Serial):
         self.parity = parity
         self.stopbits = stopbits
 
+        # timestamped ring of parsed samples, written only by the reader thread
+        self.size = size
+        self.values = np.zeros(size)
+        self.stamps = np.zeros(size)
+        self.count = 0  # total samples ever written, count % size is the next slot
+        self.sample_cond = Condition()
+
+        self.parse_errors = 0
+        self.rate = 0.0  # samples per second
+        self._line = bytearray()
+        self._thread = None
+        self._running = False
+
+        # optional replay.Recorder, gets every raw chunk read from the port
+        self.recorder = None
+
     def recv(self):
         self.flush()
         return self.readline().decode('utf-8')
 
-    def estimate(self):
-        cnt = 0
-        res = 0
-        while cnt < 100:
-            if not self.recv():
+    # ============================ Background Reader ============================
+    def start_reader(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+
+    def stop_reader(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def _read_chunk(self):
+        # whatever is buffered, or block up to timeout for one byte
+        return self.read(self.in_waiting or 1)
+
+    def _read_loop(self):
+        t_rate = time.monotonic()
+        n_rate = self.count
+        while self._running:
+            try:
+                chunk = self._read_chunk()
+            except SerialException:
+                break
+            now = time.monotonic()
+            if chunk:
+                if self.recorder is not None:
+                    self.recorder.sensor(now, chunk)
+                self._ingest(chunk, now)
+            if now - t_rate >= 1.0:
+                self.rate = (self.count - n_rate) / (now - t_rate)
+                t_rate = now
+                n_rate = self.count
+        self._running = False
+        self.rate = 0.0
+
+    def _ingest(self, chunk, stamp):
+        # split into lines and parse each complete one into the ring
+        self._line += chunk
+        *lines, self._line = self._line.split(b"\n")
+        added = False
+        for line in lines:
+            line = line.strip()
+            if not line:
                 continue
-            if res == 0:
-                res = float(self.recv())
-            res = min(res, float(self.recv()))
-            cnt += 1
-        return 160*res/5-80
+            try:
+                value = float(line)
+            except ValueError:
+                self.parse_errors += 1
+                continue
+            slot = self.count % self.size
+            self.values[slot] = value
+            self.stamps[slot] = stamp
+            self.count += 1
+            added = True
+        if added:
+            with self.sample_cond:
+                self.sample_cond.notify_all()
+
+    # ============================ Queries ============================
+    def window(self, n=100, since=None, with_stamps=False):
+        # newest n samples (and only those stamped at or after since), oldest first
+        count = self.count
+        n = min(n, count, self.size)
+        idx = np.arange(count - n, count) % self.size
+        values = self.values[idx]
+        stamps = self.stamps[idx]
+        if since is not None:
+            keep = stamps >= since
+            values = values[keep]
+            stamps = stamps[keep]
+        return (values, stamps) if with_stamps else values
+
+    def wait_samples(self, n=100, since=None, timeout=5.0, with_stamps=False):
+        # block until the window holds n samples, returns them or raises TimeoutError
+        deadline = time.monotonic() + timeout
+        with self.sample_cond:
+            while True:
+                window = self.window(n, since, with_stamps)
+                values = window[0] if with_stamps else window
+                if len(values) >= n:
+                    return window
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    raise TimeoutError(f"Sensor {self.port}: {len(values)} of {n} samples after {timeout} s")
+                self.sample_cond.wait(remaining)
+
+    @staticmethod
+    def stats(values, trim=0.1):
+        # min, median and trimmed mean in O(window) using partitions instead of a sort
+        n = len(values)
+        if n == 0:
+            return {"min": np.nan, "median": np.nan, "trimmed_mean": np.nan, "n": 0}
+        k = int(n * trim)
+        if 0 < k and n - k > k:
+            part = np.partition(values, [k, n - k - 1])
+            trimmed = part[k:n - k].mean()
+        else:
+            trimmed = values.mean()
+        return {"min": values.min(), "median": np.median(values), "trimmed_mean": trimmed, "n": n}
+
+    @staticmethod
+    def to_distance(value):
+        # 0-5 V output mapped onto the -80..80 mm measuring range
+        return 160 * value / 5 - 80
+
+    def estimate(self, n=100, since=None, timeout=5.0):
+        self.start_reader()
+        values = self.wait_samples(n, since, timeout)
+        return self.to_distance(values.min())
 
 
 if __name__ == "__main__":
     s = Sensor("COM6")
     print(s.estimate())
+    print(Sensor.stats(s.window(100)), s.rate, s.parse_errors)
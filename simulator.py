@@ -0,0 +1,377 @@
+import asyncio
+import re
+import random
+from collections import deque
+from threading import Thread, Event
+import numpy as np
+from robot_api.dobot_api import MyType
+from robot_api.robot import FEED_TEST_VALUE, ROBOT_MODE_DISABLED, ROBOT_MODE_ENABLE, ROBOT_MODE_RUNNING, \
+    ROBOT_MODE_ERROR
+
+# ErrorID replies of the controller
+ERROR_NONE = 0
+ERROR_FAILED = -1  # command rejected, e.g. robot disabled or in alarm
+ERROR_UNKNOWN_COMMAND = -10000
+
+COMMAND = re.compile(rb"\s*(\w+)\(([^)]*)\)")
+
+
+class SimulatedArm:
+    def __init__(self, pose=(275.0, -30.0, 130.0, 46.0), speed=300.0, accel=1500.0):
+        # Cartesian [x, y, z, R] (mm, mm, mm, degrees), MovL and MovJ both run as straight lines
+        # with a trapezoidal speed profile, which is close enough for cycle time estimates
+        self.pose = np.array(pose, dtype=np.float64)
+        self.speed = speed  # mm/s at SpeedFactor 100
+        self.accel = accel  # mm/s^2
+        self.speed_factor = 100
+        self.mode = ROBOT_MODE_DISABLED
+        self.error_id = 0
+        self.digital_outputs = 0
+
+        self.queue = deque()
+        self._segment = None  # (start, delta, duration, elapsed, v, a, length)
+        self.moves_done = 0
+
+    def enable(self):
+        if self.mode == ROBOT_MODE_ERROR:
+            return False
+        if self.mode == ROBOT_MODE_DISABLED:
+            self.mode = ROBOT_MODE_ENABLE
+        return True
+
+    def disable(self):
+        self.queue.clear()
+        self._segment = None
+        self.mode = ROBOT_MODE_DISABLED
+
+    def alarm(self, error_id=1):
+        # stops dead and rejects motion until ClearError
+        self.queue.clear()
+        self._segment = None
+        self.error_id = error_id
+        self.mode = ROBOT_MODE_ERROR
+
+    def clear_error(self):
+        if self.mode == ROBOT_MODE_ERROR:
+            self.mode = ROBOT_MODE_ENABLE
+        self.error_id = 0
+
+    def set_do(self, index, status):
+        bit = 1 << (index - 1)
+        self.digital_outputs = self.digital_outputs | bit if status else self.digital_outputs & ~bit
+
+    def queue_move(self, target):
+        if self.mode not in (ROBOT_MODE_ENABLE, ROBOT_MODE_RUNNING):
+            return False
+        self.queue.append(np.array(target, dtype=np.float64))
+        self.mode = ROBOT_MODE_RUNNING
+        return True
+
+    @property
+    def idle(self):
+        return self._segment is None and not self.queue
+
+    def _start_segment(self, target):
+        delta = target - self.pose
+        length = np.linalg.norm(delta[:3])
+        v = self.speed * self.speed_factor / 100.0
+        a = self.accel
+        if length < 1e-9:
+            # rotation only, give it a fixed short duration
+            duration = 0.05 if abs(delta[3]) > 1e-9 else 0.0
+        elif length >= v * v / a:
+            duration = length / v + v / a
+        else:
+            v = np.sqrt(length * a)
+            duration = 2 * v / a
+        self._segment = (self.pose.copy(), delta, duration, 0.0, v, a, length)
+
+    @staticmethod
+    def _progress(t, duration, v, a, length):
+        # fraction of the segment covered after t seconds of a trapezoidal profile
+        if length < 1e-9:
+            return min(t / duration, 1.0) if duration > 0 else 1.0
+        t_acc = v / a
+        if t <= t_acc:
+            s = 0.5 * a * t * t
+        elif t <= duration - t_acc:
+            s = 0.5 * a * t_acc * t_acc + v * (t - t_acc)
+        else:
+            rest = max(duration - t, 0.0)
+            s = length - 0.5 * a * rest * rest
+        return min(s / length, 1.0)
+
+    def step(self, dt):
+        while dt > 0:
+            if self._segment is None:
+                if not self.queue:
+                    break
+                self._start_segment(self.queue.popleft())
+            start, delta, duration, elapsed, v, a, length = self._segment
+            used = min(dt, duration - elapsed)
+            elapsed += used
+            dt -= used
+            self.pose = start + delta * self._progress(elapsed, duration, v, a, length)
+            if elapsed >= duration:
+                self.pose = start + delta
+                self._segment = None
+                self.moves_done += 1
+            else:
+                self._segment = (start, delta, duration, elapsed, v, a, length)
+        if self.mode == ROBOT_MODE_RUNNING and self.idle:
+            self.mode = ROBOT_MODE_ENABLE
+
+
+class MG400Simulator:
+    def __init__(self, host="127.0.0.1", dashboard_port=29999, move_port=30003, feed_port=30004,
+                 rate=125.0, latency=0.0, jitter=0.0, loss=0.0, corrupt=0.0, error_rate=0.0,
+                 arm: SimulatedArm = None, seed=None):
+        # TCP/IP protocol settings, ports 0 pick free ones (read back from *_port after start)
+        self.host = host
+        self.dashboard_port = dashboard_port
+        self.move_port = move_port
+        self.feed_port = feed_port
+        self.rate = rate  # feed packets per second
+
+        # fault injection: reply delay and its uniform jitter (s), probability of a dropped
+        # or corrupted feed packet, and of a command being rejected with ERROR_FAILED
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.corrupt = corrupt
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.arm = arm or SimulatedArm()
+        self.commands = []  # (loop time, command) of every command received, for cycle time analysis
+        self.packets_sent = 0
+        self.packets_lost = 0
+
+        self._servers = []
+        self._feeds = set()
+        self._tick = None
+        self._loop = None
+        self._thread = None
+        self._record = np.zeros(1, dtype=MyType)
+
+    # ============================ Server ============================
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        ports = []
+        for port, handler in ((self.dashboard_port, self._serve_dashboard),
+                              (self.move_port, self._serve_move),
+                              (self.feed_port, self._serve_feed)):
+            server = await asyncio.start_server(handler, self.host, port)
+            self._servers.append(server)
+            ports.append(server.sockets[0].getsockname()[1])
+        self.dashboard_port, self.move_port, self.feed_port = ports
+        self._tick = asyncio.ensure_future(self._run_feed())
+
+    async def stop(self):
+        if self._tick is not None:
+            self._tick.cancel()
+        for writer in list(self._feeds):
+            writer.close()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self._servers))
+        finally:
+            await self.stop()
+
+    def start_in_thread(self, timeout=5.0):
+        # for the blocking clients (RobotExec, DobotApi), runs the event loop on a daemon thread
+        ready = Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+            loop.close()
+
+        self._thread = Thread(target=run, daemon=True)
+        self._thread.start()
+        if not ready.wait(timeout):
+            raise RuntimeError("Simulator did not start")
+        return self
+
+    def stop_thread(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(2.0)
+            self._thread = None
+
+    # ============================ Command ports ============================
+    async def _serve_dashboard(self, reader, writer):
+        await self._serve_commands(reader, writer, self._dashboard_command)
+
+    async def _serve_move(self, reader, writer):
+        await self._serve_commands(reader, writer, self._move_command)
+
+    async def _serve_commands(self, reader, writer, execute):
+        # commands are handled in arrival order, each reply is written latency later
+        # but never before the previous one so pipelined clients still see FIFO replies
+        buffer = b""
+        last_due = 0.0
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                buffer += data
+                while True:
+                    match = COMMAND.match(buffer)
+                    if match is None:
+                        break
+                    buffer = buffer[match.end():]
+                    name = match.group(1).decode("utf-8")
+                    text = match.group(0).decode("utf-8").strip()
+                    args = [a.strip() for a in match.group(2).decode("utf-8").split(",") if a.strip()]
+                    self.commands.append((self._loop.time(), text))
+
+                    if self.random.random() < self.error_rate:
+                        error_id, values = ERROR_FAILED, ""
+                    else:
+                        try:
+                            error_id, values = await execute(name, args)
+                        except (ValueError, IndexError):
+                            # malformed or missing arguments are rejected like the controller does
+                            error_id, values = ERROR_FAILED, ""
+                    reply = f"{error_id},{{{values}}},{text};".encode("utf-8")
+
+                    delay = self.latency + self.random.uniform(0, self.jitter)
+                    last_due = max(self._loop.time() + delay, last_due)
+                    self._loop.call_at(last_due, self._write, writer, reply)
+        except (ConnectionError, asyncio.CancelledError):
+            # client gone or simulator shutting down
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(writer, data):
+        if not writer.is_closing():
+            writer.write(data)
+
+    async def _dashboard_command(self, name, args):
+        arm = self.arm
+        if name == "EnableRobot":
+            return (ERROR_NONE if arm.enable() else ERROR_FAILED), ""
+        if name == "DisableRobot":
+            arm.disable()
+            return ERROR_NONE, ""
+        if name == "ClearError":
+            arm.clear_error()
+            return ERROR_NONE, ""
+        if name == "ResetRobot":
+            arm.queue.clear()
+            arm._segment = None
+            return ERROR_NONE, ""
+        if name == "DO":
+            arm.set_do(int(args[0]), int(args[1]))
+            return ERROR_NONE, ""
+        if name == "SpeedFactor":
+            arm.speed_factor = min(max(int(args[0]), 1), 100)
+            return ERROR_NONE, ""
+        if name == "RobotMode":
+            return ERROR_NONE, str(arm.mode)
+        if name == "GetErrorID":
+            return ERROR_NONE, f"[[{arm.error_id}]]"
+        if name == "GetPose":
+            return ERROR_NONE, ",".join(f"{v:f}" for v in (*arm.pose, 0.0, 0.0))
+        if name in ("PayLoad", "Tool", "User", "AccL", "AccJ", "SpeedL", "SpeedJ", "CP"):
+            # accepted for compatibility, no effect on the simulated motion
+            return ERROR_NONE, ""
+        return ERROR_UNKNOWN_COMMAND, ""
+
+    async def _move_command(self, name, args):
+        arm = self.arm
+        if name in ("MovL", "MovJ"):
+            if len(args) < 4:
+                return ERROR_FAILED, ""
+            target = [float(a) for a in args[:4]]
+            if not np.all(np.isfinite(target)):
+                return ERROR_FAILED, ""
+            return (ERROR_NONE if arm.queue_move(target) else ERROR_FAILED), ""
+        if name == "Sync":
+            # reply once the motion queue has drained, holds back the replies behind it
+            while not arm.idle and arm.mode == ROBOT_MODE_RUNNING:
+                await asyncio.sleep(1.0 / self.rate)
+            return ERROR_NONE, ""
+        return ERROR_UNKNOWN_COMMAND, ""
+
+    # ============================ Feed port ============================
+    async def _serve_feed(self, reader, writer):
+        self._feeds.add(writer)
+        try:
+            # the feed port ignores input, this only notices the client going away
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._feeds.discard(writer)
+            writer.close()
+
+    def _pack(self):
+        record = self._record
+        record["test_value"] = FEED_TEST_VALUE
+        record["robot_mode"] = self.arm.mode
+        record["tool_vector_actual"][0][:4] = self.arm.pose
+        if "len" in MyType.names:
+            record["len"] = MyType.itemsize
+        if "digital_outputs" in MyType.names:
+            record["digital_outputs"] = self.arm.digital_outputs
+        if "error_status" in MyType.names:
+            record["error_status"] = self.arm.mode == ROBOT_MODE_ERROR
+        if "speed_scaling" in MyType.names:
+            record["speed_scaling"] = self.arm.speed_factor
+        return record.tobytes()
+
+    async def _run_feed(self):
+        # one clock for motion and feed, on an absolute schedule so the rate does not drift
+        period = 1.0 / self.rate
+        last = self._loop.time()
+        due = last
+        while True:
+            due += period
+            await asyncio.sleep(max(due - self._loop.time(), 0.0))
+            now = self._loop.time()
+            self.arm.step(now - last)
+            last = now
+
+            packet = self._pack()
+            for writer in list(self._feeds):
+                if self.random.random() < self.loss:
+                    self.packets_lost += 1
+                    continue
+                if writer.transport.get_write_buffer_size() > 64 * MyType.itemsize:
+                    # client stopped reading, drop instead of buffering without bound
+                    self.packets_lost += 1
+                    continue
+                if self.random.random() < self.corrupt:
+                    data = bytearray(packet)
+                    offset = MyType.fields["test_value"][1]
+                    data[offset] ^= 0xFF
+                    writer.write(bytes(data))
+                else:
+                    writer.write(packet)
+                self.packets_sent += 1
+
+
+async def _demo():
+    sim = MG400Simulator(latency=0.002, jitter=0.002, loss=0.01)
+    print(f"MG400 simulator on {sim.host}: {sim.dashboard_port}/{sim.move_port}/{sim.feed_port}")
+    await sim.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+cv2 = pytest.importorskip("cv2")
+if not hasattr(getattr(cv2, "aruco", None), "Dictionary_get"):
+    pytest.skip("needs the opencv-contrib aruco api the camera is written against", allow_module_level=True)
+pytest.importorskip("vision_api.camera")
+replay = pytest.importorskip("replay")
+benchmark = pytest.importorskip("benchmark")
+
+
+def write_log(path, frames=5, shape=(48, 64, 3)):
+    # a recording directory in the replay.Recorder layout with only camera frames in it
+    os.makedirs(path)
+    with open(os.path.join(path, replay.META_FILE), "w") as f:
+        json.dump({"frame_shape": list(shape), "frame_dtype": "uint8", "created": 0.0}, f)
+    np.zeros((frames, *shape), dtype=np.uint8).tofile(os.path.join(path, replay.FRAMES_FILE))
+    np.arange(frames, dtype=np.float64).tofile(os.path.join(path, replay.FRAME_INDEX_FILE))
+    for name in (replay.FEED_FILE, replay.SENSOR_FILE):
+        open(os.path.join(path, name), "wb").close()
+
+
+def test_log_mode(tmp_path):
+    log = str(tmp_path / "log")
+    out = str(tmp_path / "bench")
+    write_log(log)
+    benchmark.main(["--log", log, "--frames", "5", "--out", out])
+
+    with open(out + ".json") as f:
+        report = json.load(f)
+    stages = {row["stage"]: row for row in report["stages"]}
+    assert report["log"] == log
+    assert stages["frame_grab"]["count"] > 0
+    assert stages["calib_transform"]["count"] > 0
+    assert os.path.exists(out + ".csv")
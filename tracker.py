@@ -0,0 +1,133 @@
+import time
+import numpy as np
+from threading import Lock, Condition
+
+
+class Track:
+    # constant-velocity kalman filter over D coordinates that share one motion model,
+    # so a single 2x2 [position, velocity] covariance serves every coordinate and
+    # predict/update are vectorized across them
+    def __init__(self, z, stamp, measurement_noise):
+        self.x = np.zeros((2, len(z)))
+        self.x[0] = z
+        self.P = np.diag([measurement_noise, 1e4])
+        self.stamp = stamp
+        self.hits = 1
+        self.rejects = 0  # consecutive gated-out measurements
+
+    def predict(self, stamp, process_noise):
+        dt = max(stamp - self.stamp, 0.0)
+        if dt == 0.0:
+            return
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        Q = process_noise * np.array([[dt ** 3 / 3.0, dt ** 2 / 2.0], [dt ** 2 / 2.0, dt]])
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+        self.stamp = stamp
+
+    def innovation(self, z, measurement_noise):
+        # residual and its variance, shared by every coordinate
+        return z - self.x[0], self.P[0, 0] + measurement_noise
+
+    def update(self, innovation, s):
+        K = self.P[:, 0] / s
+        self.x += np.outer(K, innovation)
+        self.P = self.P - np.outer(K, self.P[0])
+        self.hits += 1
+        self.rejects = 0
+
+
+class Tracker:
+    def __init__(self, process_noise=100.0, measurement_noise=1.0, gate=4.0, max_rejects=5,
+                 settle_std=1.0, settle_speed=5.0, min_hits=8, max_age=0.5):
+        # noise in px^2 (process noise per s^3), settle thresholds in px and px/s
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.gate = gate
+        self.max_rejects = max_rejects
+        self.settle_std = settle_std
+        self.settle_speed = settle_speed
+        self.min_hits = min_hits
+        self.max_age = max_age
+
+        self.tracks = {}
+        self.outliers = 0
+        self._lock = Lock()
+        self.updated = Condition(self._lock)
+
+    def update(self, key, z, stamp):
+        # fuse one detection, returns False when it was rejected as an outlier
+        z = np.asarray(z, dtype=np.float64).ravel()
+        with self._lock:
+            track = self.tracks.get(key)
+            if track is None or track.x.shape[1] != len(z):
+                self.tracks[key] = Track(z, stamp, self.measurement_noise)
+                self.updated.notify_all()
+                return True
+
+            track.predict(stamp, self.process_noise)
+            innovation, s = track.innovation(z, self.measurement_noise)
+            if np.max(innovation ** 2) / s > self.gate ** 2:
+                self.outliers += 1
+                track.rejects += 1
+                # the object really moved, restart rather than reject forever
+                if track.rejects >= self.max_rejects:
+                    self.tracks[key] = Track(z, stamp, self.measurement_noise)
+                self.updated.notify_all()
+                return False
+
+            track.update(innovation, s)
+            self.updated.notify_all()
+            return True
+
+    def _settled(self, track, now):
+        return (track.hits >= self.min_hits
+                and now - track.stamp <= self.max_age
+                and np.sqrt(track.P[0, 0]) <= self.settle_std
+                and np.max(np.abs(track.x[1])) <= self.settle_speed)
+
+    def estimate(self, key, now=None):
+        # (position, covariance, settled) or None, covariance is the shared [pos, vel] 2x2
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            track = self.tracks.get(key)
+            if track is None:
+                return None
+            return track.x[0].copy(), track.P.copy(), self._settled(track, now)
+
+    def is_settled(self, key, now=None):
+        estimate = self.estimate(key, now)
+        return estimate is not None and estimate[2]
+
+    def wait_settled(self, key, timeout=2.0):
+        # block until the track converges, returns its position or None on timeout
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                track = self.tracks.get(key)
+                if track is not None and self._settled(track, now):
+                    return track.x[0].copy()
+                if now >= deadline:
+                    return None
+                self.updated.wait(deadline - now)
+
+    def wait_all_settled(self, keys, timeout=2.0):
+        # block until every track in keys converges, returns {key: position} or None on timeout
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                tracks = [self.tracks.get(key) for key in keys]
+                if all(t is not None and self._settled(t, now) for t in tracks):
+                    return {key: t.x[0].copy() for key, t in zip(keys, tracks)}
+                if now >= deadline:
+                    return None
+                self.updated.wait(deadline - now)
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self.tracks.clear()
+            else:
+                self.tracks.pop(key, None)